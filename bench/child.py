@@ -0,0 +1,37 @@
+# Shared by the benchmarks: one solve timed (optionally under tracemalloc)
+# and run in a child process, so a blow-up can be cut off by a timeout.
+
+import multiprocessing as mp
+import time
+import tracemalloc
+from engine.api import solve
+
+def timed_solve(puzzle, method, traced=False, **options):
+    # (solution, stats, seconds, peak bytes or None without tracing); options
+    # go to the engine
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    solution, stats = solve(puzzle.initial_grid(), puzzle, method, **options)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if traced:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return solution, stats, elapsed, peak
+
+def _child(target, args, out):
+    out.put(target(*args))
+
+def run_isolated(target, args, timeout):
+    # target(*args) in a child process; its result, or None if it timed out
+    # or died without one.
+    out = mp.Queue()
+    proc = mp.Process(target=_child, args=(target, args, out))
+    proc.start()
+    proc.join(timeout)
+    if proc.is_alive():
+        proc.terminate()
+        proc.join()
+        return None
+    return out.get() if not out.empty() else None
@@ -0,0 +1,44 @@
+# How each solver's time and memory grow with the board size N.
+# Usage: python -m bench.scaling [--sizes 6 8 10 12 14] [--puzzles 3] [--timeout 30]
+
+import argparse
+import random
+from bench.child import run_isolated, timed_solve
+from engine.api import ENGINES
+from game.patterns import random_puzzle
+
+def _run(method, size, seed):
+    puzzle, _ = random_puzzle(size, random.Random(seed))
+    solution, _, elapsed, peak = timed_solve(puzzle, method, traced=True)
+    return solution is not None, elapsed, peak
+
+def measure(method, size, seed, timeout):
+    return run_isolated(_run, (method, size, seed), timeout)
+
+def main():
+    parser = argparse.ArgumentParser(description="Solver scaling benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[6, 8, 10, 12, 14])
+    parser.add_argument("--methods", nargs="+", default=list(ENGINES))
+    parser.add_argument("--puzzles", type=int, default=3, help="random puzzles per size")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds per solve")
+    args = parser.parse_args()
+
+    print(f"{'method':<8} {'N':>3} {'solved':>7} {'mean s':>9} {'max s':>9} {'peak MiB':>9}")
+    for method in args.methods:
+        for size in args.sizes:
+            runs = [measure(method, size, seed, args.timeout) for seed in range(args.puzzles)]
+            done = [r for r in runs if r is not None]
+            solved = sum(1 for r in done if r[0])
+            if not done:
+                print(f"{method:<8} {size:>3} {'timeout':>7}")
+                break  # larger boards will not finish either
+            times = [r[1] for r in done]
+            peak = max(r[2] for r in done) / 2 ** 20
+            print(f"{method:<8} {size:>3} {solved:>3}/{args.puzzles:<3} {sum(times) / len(times):>9.3f} "
+                  f"{max(times):>9.3f} {peak:>9.1f}", flush=True)
+            if len(done) < len(runs):
+                print(f"{method:<8} {size:>3} {len(runs) - len(done)} timed out; stopping here")
+                break
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# Reproducible solver benchmarks over a fixed, seeded corpus of unique puzzles.
+# Usage: python -m bench.suite run [--sizes 6 8 10] [--puzzles 10] [--methods ...]
+#            [--repeat 3] [--timeout 30] [--out results.json]
+#        python -m bench.suite compare baseline.json results.json [--threshold 0.1]
+#
+# Every solve runs in a child process (so a blow-up can be cut off). Wall
+# time is the best of --repeat runs without tracing; peak memory comes from
+# one extra run under tracemalloc. compare exits 1 if anything regressed.
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+from bench.child import run_isolated, timed_solve
+from engine.api import ENGINES
+from engine.generate import generate_puzzle, task_seed
+from game.constraints import check_win
+from game.pack import Corpus
+
+# Stat each engine reports as its unit of search work
+NODE_KEYS = ("expanded", "nodes", "branches", "decisions", "steps")
+
+# Randomized engines; their solve() takes a seed
+SEEDED = ("qlearn", "qapprox")
+
+def corpus(seed, size, count, pack=None):
+    if pack:
+        with Corpus(pack) as c:
+            return [c[k] for k in range(min(count, len(c)))]
+    return [generate_puzzle(size, random.Random(task_seed(seed, size, k)))[0] for k in range(count)]
+
+def _run(method, puzzle, repeat):
+    best, stats, solution = None, {}, None
+    for k in range(repeat + 1):
+        # run k of a randomized engine always gets seed k, so its numbers
+        # depend on the tree alone
+        options = {"seed": k} if method in SEEDED else {}
+        traced = k == repeat
+        solution, stats, elapsed, traced_peak = timed_solve(puzzle, method, traced, **options)
+        if traced:
+            peak = traced_peak
+        else:
+            best = elapsed if best is None else min(best, elapsed)
+    nodes = next((stats[k] for k in NODE_KEYS if k in stats), None)
+    solved = solution is not None and bool(check_win(solution, puzzle))
+    return {"solved": solved, "time": best, "nodes": nodes, "peak_kib": peak / 1024}
+
+def measure(method, puzzle, repeat, timeout):
+    return run_isolated(_run, (method, puzzle, repeat), timeout)
+
+def summarize(method, size, runs):
+    done = [r for r in runs if r is not None]
+    entry = {"method": method, "size": size, "puzzles": len(runs),
+             "solved": sum(r["solved"] for r in done), "timeouts": len(runs) - len(done), "runs": runs}
+    if done:
+        times = [r["time"] for r in done]
+        nodes = [r["nodes"] for r in done if r["nodes"] is not None]
+        entry.update(time_median=statistics.median(times), time_mean=statistics.fmean(times), time_max=max(times),
+                     nodes_mean=statistics.fmean(nodes) if nodes else None,
+                     peak_kib=max(r["peak_kib"] for r in done))
+    return entry
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    results = []
+    print(f"{'method':<8} {'N':>3} {'solved':>8} {'median ms':>10} {'max ms':>10} {'nodes':>10} {'peak KiB':>9}")
+    puzzles = {size: corpus(args.seed, size, args.puzzles, args.pack) for size in args.sizes}
+    for method in args.methods:
+        for size in args.sizes:
+            entry = summarize(method, size, [measure(method, p, args.repeat, args.timeout) for p in puzzles[size]])
+            results.append(entry)
+            if "time_median" not in entry:
+                print(f"{method:<8} {size:>3} {'timeout':>8}", flush=True)
+                break  # larger boards will not finish either
+            nodes = f"{entry['nodes_mean']:.0f}" if entry["nodes_mean"] is not None else "-"
+            print(f"{method:<8} {size:>3} {entry['solved']:>4}/{entry['puzzles']:<3} "
+                  f"{entry['time_median'] * 1000:>10.2f} {entry['time_max'] * 1000:>10.2f} {nodes:>10} "
+                  f"{entry['peak_kib']:>9.0f}", flush=True)
+            if entry["timeouts"]:
+                print(f"{method:<8} {size:>3} {entry['timeouts']} timed out; stopping here")
+                break
+    report = {"meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": git_commit(),
+                       "python": platform.python_version(), "numpy": np.__version__,
+                       "machine": platform.machine(), "seed": args.seed, "pack": args.pack,
+                       "sizes": args.sizes, "puzzles": args.puzzles, "repeat": args.repeat,
+                       "timeout": args.timeout},
+              "results": results}
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Wrote {args.out}")
+
+def compare(args):
+    # Flags slower median time (beyond --threshold and --min-ms), more nodes
+    # or memory (beyond --threshold) and fewer solves or more timeouts.
+    with open(args.baseline) as f:
+        base = {(r["method"], r["size"]): r for r in json.load(f)["results"]}
+    with open(args.current) as f:
+        current = {(r["method"], r["size"]): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"{'method':<8} {'N':>3} {'time':>18} {'nodes':>18} {'peak KiB':>18} {'solved':>9}  verdict")
+    for key in sorted(base.keys() & current.keys()):
+        old, new = base[key], current[key]
+        problems = []
+        if new["solved"] < old["solved"] or new["timeouts"] > old["timeouts"]:
+            problems.append("solve rate")
+        cells = []
+        for field, scale, label in (("time_median", 1000, "time"), ("nodes_mean", 1, "nodes"), ("peak_kib", 1, "memory")):
+            a, b = old.get(field), new.get(field)
+            if a is None or b is None:
+                cells.append(f"{'-':>18}")
+                continue
+            change = (b - a) / a if a else 0.0
+            cells.append(f"{a * scale:>7.1f}->{b * scale:<7.1f}{change:+.0%}".rjust(18))
+            worse = change > args.threshold
+            if label == "time":
+                worse = worse and (b - a) * 1000 > args.min_ms
+            if worse:
+                problems.append(label)
+        regressions += bool(problems)
+        print(f"{key[0]:<8} {key[1]:>3} {' '.join(cells)} {old['solved']:>4}->{new['solved']:<4} "
+              f"{'REGRESSION: ' + ', '.join(problems) if problems else 'ok'}")
+    for key in sorted(base.keys() - current.keys()):
+        print(f"{key[0]:<8} {key[1]:>3} missing from {args.current}")
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+def stable(args):
+    # Solves every puzzle twice and flags the runs whose result or node count
+    # differ: with per-run seeds, two runs of the same tree must agree, and
+    # compare then only sees timing noise.
+    unstable = 0
+    puzzles = {size: corpus(args.seed, size, args.puzzles, args.pack) for size in args.sizes}
+    for method in args.methods:
+        for size in args.sizes:
+            for k, puzzle in enumerate(puzzles[size]):
+                first, second = (measure(method, puzzle, 0, args.timeout) for _ in range(2))
+                if first is None or second is None:
+                    print(f"{method:<8} {size:>3} puzzle {k}: timed out")
+                    continue
+                a, b = (first["solved"], first["nodes"]), (second["solved"], second["nodes"])
+                if a != b:
+                    unstable += 1
+                    print(f"{method:<8} {size:>3} puzzle {k}: solved, nodes {a} then {b}")
+    print(f"{unstable} unstable run(s)")
+    return 1 if unstable else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Solver benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("run", help="benchmark the engines and save JSON results")
+    p.add_argument("--sizes", type=int, nargs="+", default=[6, 8, 10])
+    p.add_argument("--methods", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    p.add_argument("--puzzles", type=int, default=10, help="puzzles per size")
+    p.add_argument("--seed", default="bench", help="corpus seed; puzzle k of size N uses seed:N:k")
+    p.add_argument("--pack", help="use the first --puzzles puzzles of this .tngo pack instead (single size)")
+    p.add_argument("--repeat", type=int, default=3, help="timed runs per puzzle; the best one counts")
+    p.add_argument("--timeout", type=float, default=30.0, help="seconds per puzzle")
+    p.add_argument("--out", default="bench-results.json")
+    p = sub.add_parser("stable", help="check that two runs of every engine agree")
+    p.add_argument("--sizes", type=int, nargs="+", default=[6, 8])
+    p.add_argument("--methods", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    p.add_argument("--puzzles", type=int, default=3, help="puzzles per size")
+    p.add_argument("--seed", default="bench", help="corpus seed; puzzle k of size N uses seed:N:k")
+    p.add_argument("--pack", help="use the first --puzzles puzzles of this .tngo pack instead (single size)")
+    p.add_argument("--timeout", type=float, default=30.0, help="seconds per puzzle")
+    p = sub.add_parser("compare", help="flag regressions against a baseline")
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--threshold", type=float, default=0.10, help="relative growth in time, nodes or memory tolerated")
+    p.add_argument("--min-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+    if args.command in ("run", "stable") and args.pack:
+        with Corpus(args.pack) as c:
+            args.sizes = [c.size]
+    if args.command == "run":
+        run(args)
+    elif args.command == "stable":
+        sys.exit(stable(args))
+    else:
+        sys.exit(compare(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Generalized arc consistency (AC-3 style propagation over every rule)
+# followed by MRV/LCV search that keeps the domains consistent
+
+from engine.propagate import DomainStore, HashedDomainStore
+from engine.search import search
+from engine.zobrist import TranspositionTable, Zobrist
+from engine.instrument import profiled
+
+def get_domains(grid, puzzle, zobrist=None):
+    return DomainStore(grid, puzzle) if zobrist is None else HashedDomainStore(grid, puzzle, zobrist)
+
+@profiled
+def ac3(store, on_revise=None, stats=None):
+    # Generalized arc consistency over the edge, window and line propagators;
+    # on_revise(cell) fires for every domain reduction.
+    return store.propagate(stats=stats, on_change=on_revise)
+
+def solve(grid, puzzle, on_revise=None, on_step=None, inference="mac", order="mrv", tt=None, symmetry=False):
+    # Fills grid in place; returns it when solved, None otherwise.
+    # inference is "mac" or "fc"; order is "mrv" (MRV/LCV) or "static".
+    # tt (a TranspositionTable) or symmetry turn on dead-position caching,
+    # keyed canonically under the puzzle's symmetries with symmetry.
+    stats = {"revise_calls": 0, "domain_reductions": 0, "nodes": 0, "backtracks": 0}
+    if symmetry and tt is None:
+        tt = TranspositionTable()
+    store = get_domains(grid, puzzle, None if tt is None else Zobrist(puzzle, symmetry))
+    n = puzzle.size
+
+    def sync():
+        for cell in range(n * n):
+            grid[cell // n][cell % n] = store.value(cell)
+
+    def fix(cell):
+        # cells narrowed to one value are written to the grid as they happen
+        r, c = divmod(cell, n)
+        grid[r][c] = store.value(cell)
+        if on_revise:
+            on_revise((r, c))
+
+    def step(cell):
+        sync()
+        on_step(divmod(cell, n))
+
+    if not ac3(store, fix if on_revise else None, stats):
+        stats["status"] = "AC-3 detected inconsistency"
+        return None, stats
+    found = search(store, stats, inference, order, step if on_step else None, tt)
+    if tt is not None:
+        stats.update(tt.report())
+    if not found:
+        sync()
+        stats["status"] = "Search failed after AC-3"
+        return None, stats
+    sync()
+    stats["status"] = "solved"
+    return grid, stats
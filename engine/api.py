@@ -0,0 +1,65 @@
+# Headless entry point to the solvers: no pygame, no display needed
+
+import importlib
+import time
+from contextlib import nullcontext
+import numpy as np
+from engine.cache import cache_key
+from engine.instrument import recording
+
+ENGINES = {
+    "astar": "engine.astar",
+    "ac3": "engine.ac3",
+    "qlearn": "engine.qlearn",
+    "qapprox": "engine.qapprox",
+    "lines": "engine.lines",
+    "sat": "engine.sat",
+    "count": "engine.count",
+}
+
+# Bump a method's version whenever a change can alter what it returns; cached
+# results of older versions are then ignored (engine.cache).
+VERSIONS = {
+    "astar": 1,
+    "ac3": 1,
+    "qlearn": 1,
+    "qapprox": 1,
+    "lines": 1,
+    "sat": 1,
+    "count": 1,
+}
+
+# learning agents: a rerun is the point, so their results are never cached
+UNCACHED = {"qlearn", "qapprox"}
+
+def solver_version(method):
+    return f"{method}/{VERSIONS[method]}"
+
+def solve(grid, puzzle, method="astar", profile=False, cache=None, **options):
+    # Returns (solution or None, stats); the caller's grid is left untouched.
+    # With profile, stats["profile"] holds engine.instrument's call counts and
+    # per-phase times for this solve. With a SolutionCache, a solve seen
+    # before is answered from it (stats["cached"] is True) and new results
+    # are stored.
+    key = None
+    if cache is not None and not profile and method not in UNCACHED:
+        start = time.perf_counter()
+        key = cache_key(grid, puzzle, method, options)
+        hit = key and cache.get(key, solver_version(method))
+        if hit:
+            solution, stats = hit
+            stats["time"] = time.perf_counter() - start
+            stats["solved"] = solution is not None
+            stats["cached"] = True
+            return solution, stats
+    module = importlib.import_module(ENGINES[method])
+    with (recording() if profile else nullcontext()) as recorder:
+        start = time.perf_counter()
+        solution, stats = module.solve(np.copy(grid), puzzle, **options)
+        stats["time"] = time.perf_counter() - start
+    stats["solved"] = solution is not None
+    if key:
+        cache.put(key, solver_version(method), solution, stats)
+    if profile:
+        stats["profile"] = recorder.report()
+    return solution, stats
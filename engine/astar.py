@@ -0,0 +1,317 @@
+# A* search over partial grids, filling the first empty cell at each step.
+# Nodes hold a packed key (2 bits per cell), their parent's index and the
+# move that produced them; full grids are rebuilt only for the final path.
+# Also runs as weighted A* (epsilon), IDA* or beam search. Duplicates are
+# caught with an exact set of packed keys, per solve; with symmetry it holds
+# the smallest key among a board's images, so symmetric boards merge. A
+# transposition table, which may be shared across solves, only remembers
+# dead boards (no line can be completed) by Zobrist key.
+
+import numpy as np
+import heapq
+from game.constraints import RULES, check_win, check_triples, check_equal_counts, check_constraints, is_valid, batch_is_valid, IncrementalChecker
+from engine.lines import initial_state, propagate
+from engine.zobrist import TranspositionTable, Zobrist, image, symmetries
+from engine.instrument import profiled
+
+STOP_POLL = 256  # IDA* nodes between should_stop() polls
+
+class Stopped(Exception):
+    pass
+
+class Node:
+    __slots__ = ("key", "parent", "move", "hashes")
+
+    def __init__(self, key, parent=-1, move=None, hashes=None):
+        self.key = key
+        self.parent = parent  # index into the node list, -1 for the root
+        self.move = move      # cell << 2 | value written to reach this node
+        self.hashes = hashes  # Zobrist hashes, kept only with a transposition table
+
+def pack(grid):
+    # Cell i of the flattened grid lives in bits 2i and 2i+1.
+    flat = np.asarray(grid, dtype=np.uint8).ravel()
+    flat = np.concatenate([flat, np.zeros(-len(flat) % 4, dtype=np.uint8)])
+    packed = flat[0::4] | flat[1::4] << 2 | flat[2::4] << 4 | flat[3::4] << 6
+    return int.from_bytes(packed.tobytes(), "little")
+
+def unpack_many(keys, size):
+    # (len(keys), size*size) uint8 array of flattened grids.
+    width = (size * size + 3) // 4
+    raw = np.frombuffer(b"".join(k.to_bytes(width, "little") for k in keys), dtype=np.uint8)
+    cells = raw.reshape(len(keys), width, 1) >> np.array([0, 2, 4, 6], dtype=np.uint8) & 3
+    return cells.reshape(len(keys), width * 4)[:, :size * size]
+
+def unpack(key, size):
+    return unpack_many([key], size)[0].reshape(size, size).astype(int)
+
+SWAP = np.array([0, 2, 1], dtype=np.uint8)
+
+def symmetry_maps(puzzle):
+    # (perms, swapped) for the puzzle's symmetries, or None if it has none
+    # but the identity: row k of perms maps a flat board to its k-th image,
+    # and swapped marks the images that also exchange sun and moon.
+    n = puzzle.size
+    group = symmetries(puzzle)
+    if len(group) == 1:
+        return None
+    perms = np.empty((len(group), n * n), dtype=np.intp)
+    for k, (transform, _) in enumerate(group):
+        for cell in range(n * n):
+            r, c = image(transform, *divmod(cell, n), n)
+            perms[k, r * n + c] = cell
+    return perms, np.array([swap for _, swap in group])
+
+def canonical_key(flat, maps):
+    # Exact key shared by a flat board and all its images: the smallest of
+    # their byte strings.
+    perms, swapped = maps
+    images = flat[perms]
+    images[swapped] = SWAP[images[swapped]]
+    return min(images.view(f"S{images.shape[1]}").ravel().tolist())
+
+# Frontier entries are single ints ordered like (f, g, index).
+INDEX_BITS = 32
+COST_BITS = 16
+
+def entry(f, g, index):
+    return (f << COST_BITS | g) << INDEX_BITS | index
+
+def split_entry(e):
+    index = e & ((1 << INDEX_BITS) - 1)
+    costs = e >> INDEX_BITS
+    return costs >> COST_BITS, costs & ((1 << COST_BITS) - 1), index
+
+@profiled
+def expand_layer(grids, size, puzzle=None):
+    # grids is a (k, N*N) array of boards. Returns (row, cell, value) for each
+    # valid child, filling each board's first empty cell; one batched check.
+    empty = grids == 0
+    rows = np.flatnonzero(empty.any(axis=1))
+    if not len(rows):
+        return []
+    cells = np.repeat(empty[rows].argmax(axis=1), 2)
+    values = np.tile(np.array([1, 2], dtype=np.uint8), len(rows))
+    children = np.repeat(grids[rows], 2, axis=0)
+    children[np.arange(len(children)), cells] = values
+    children = children.reshape(-1, size, size)
+    valid = batch_is_valid(children, puzzle=puzzle)
+    return [(int(rows[k // 2]), int(cells[k]), int(values[k]), children[k]) for k in np.flatnonzero(valid)]
+
+@profiled
+def heuristic(grid, puzzle=None):
+    if is_valid(grid, puzzle):
+        return 0
+    return len(check_triples(grid, puzzle)) + len(check_equal_counts(grid, puzzle)) + len(check_constraints(grid, puzzle))
+
+@profiled
+def pattern_heuristic(grid, puzzle=None):
+    # Empty cells that line-pattern propagation can't decide. Forced cells
+    # still take a move each, so this never overestimates; boards where some
+    # line runs out of patterns can't be completed and get None (pruned).
+    p = puzzle or RULES
+    n = p.size
+    state = initial_state(grid, p)
+    counts = {"line_revisions": 0, "forced_cells": 0}
+    if not propagate(state, [(True, i) for i in range(n)] + [(False, j) for j in range(n)], counts):
+        return None
+    return int(np.count_nonzero(np.asarray(grid) == 0)) - counts["forced_cells"]
+
+HEURISTICS = {"lines": pattern_heuristic, "violations": heuristic}
+
+def a_star_solver(start_grid, locked, puzzle=None, stats=None, mode="astar", heuristic="lines", epsilon=0.0, width=64,
+                  tt=None, symmetry=False, should_stop=None):
+    # mode: "astar" (weighted when epsilon > 0: f = g + (1 + epsilon) * h),
+    # "ida" (IDA*, memory linear in depth) or "beam" (keeps the `width` best
+    # boards per depth; incomplete). Returns the path of grids or None.
+    # With symmetry, "astar" treats boards that are images of each other under
+    # the puzzle's symmetries as one. tt (a TranspositionTable, safe to share
+    # between solves of the same puzzle) caches boards found dead, keyed
+    # canonically with symmetry.
+    # should_stop() is polled between layers (IDA*: every STOP_POLL nodes);
+    # when it returns True the search gives up with None and stats["stopped"].
+    if stats is None:
+        stats = {}
+    stats.update(expanded=0, generated=0)
+    start_grid = np.array(start_grid)
+    size = len(start_grid)
+    for (r, c), val in locked.items():
+        start_grid[r][c] = val
+    if not is_valid(start_grid, puzzle):
+        return None  # expansion only re-checks the cell it writes
+    h_fn = HEURISTICS[heuristic]
+    h = h_fn(start_grid, puzzle)
+    if h is None:
+        return None
+    if mode == "ida":
+        return ida_star(start_grid, h_fn, puzzle, stats, should_stop)
+    if mode == "beam":
+        return beam_search(start_grid, width, puzzle, stats, should_stop)
+    nodes = [Node(pack(start_grid))]
+    frontier = [entry(h + int(epsilon * h), 0, 0)]
+    stats.update(pushed=1, popped=0, peak_frontier=1)
+    # Every path to a board fills the same cells, so it always has the same g:
+    # an exact set of packed keys is a complete closed/open check.
+    maps = symmetry_maps(puzzle or RULES) if symmetry else None
+    seen = {canonical_key(start_grid.ravel().astype(np.uint8), maps) if maps else nodes[0].key}
+    if symmetry and tt is None:
+        tt = TranspositionTable()
+    if tt is not None:
+        zobrist = Zobrist(puzzle or RULES, symmetry)
+        nodes[0].hashes = zobrist.hashes(start_grid.ravel().tolist())
+    while frontier:
+        if should_stop and should_stop():
+            stats["stopped"] = True
+            return None
+        f, g, index = split_entry(heapq.heappop(frontier))
+        # Pop every node tied on (f, g) and expand them as one batch.
+        layer = [index]
+        while frontier and frontier[0] >> INDEX_BITS == f << COST_BITS | g:
+            layer.append(heapq.heappop(frontier) & ((1 << INDEX_BITS) - 1))
+        stats["popped"] += len(layer)
+        grids = unpack_many([nodes[i].key for i in layer], size)
+        for row in np.flatnonzero(~(grids == 0).any(axis=1)):
+            if check_win(grids[row].reshape(size, size), puzzle):
+                return reconstruct_path(nodes, layer[row], size)
+        stats["expanded"] += len(layer)
+        new_cost = g + 1
+        for row, cell, val, child in expand_layer(grids, size, puzzle):
+            parent = layer[row]
+            key = nodes[parent].key | val << 2 * cell
+            closed = canonical_key(child.ravel(), maps) if maps else key
+            if closed in seen:
+                continue
+            seen.add(closed)
+            hashes = None
+            if tt is not None:
+                hashes = zobrist.update(nodes[parent].hashes, cell, 0, val)
+                if tt.get(Zobrist.key(hashes)) is False:
+                    continue
+            # children passed the batch check, so the violation count is 0
+            h = 0 if heuristic == "violations" else h_fn(child, puzzle)
+            if h is None:
+                if tt is not None:
+                    tt[Zobrist.key(hashes)] = False
+                continue
+            stats["generated"] += 1
+            stats["pushed"] += 1
+            nodes.append(Node(key, parent, cell << 2 | val, hashes))
+            heapq.heappush(frontier, entry(new_cost + h + int(epsilon * h), new_cost, len(nodes) - 1))
+        if len(frontier) > stats["peak_frontier"]:
+            stats["peak_frontier"] = len(frontier)
+    return None
+
+def ida_star(grid, h_fn, puzzle, stats, should_stop=None):
+    # Depth-first probes bounded by f = g + h, raising the bound to the
+    # smallest f that overflowed; only the current path is kept in memory.
+    # Moves are checked by an IncrementalChecker that follows the probe's
+    # assignments and undoes them with it.
+    size = len(grid)
+    grid = grid.copy()
+    empties = [divmod(k, size) for k in np.flatnonzero(grid.ravel() == 0)]
+    moves = []
+    checker = IncrementalChecker(grid, puzzle)
+
+    def probe(g, bound):
+        if g == len(empties):
+            return True
+        r, c = empties[g]
+        stats["expanded"] += 1
+        if should_stop and not stats["expanded"] % STOP_POLL and should_stop():
+            raise Stopped
+        smallest = None
+        for val in (1, 2):
+            grid[r][c] = val
+            if checker.assign(r, c, val):
+                stats["generated"] += 1
+                h = h_fn(grid, puzzle)
+                if h is not None:
+                    f = g + 1 + h
+                    if f > bound:
+                        smallest = f if smallest is None else min(smallest, f)
+                    else:
+                        moves.append(((r, c), val))
+                        found = probe(g + 1, bound)
+                        if found is True:
+                            return True
+                        moves.pop()
+                        if found is not None:
+                            smallest = found if smallest is None else min(smallest, found)
+            checker.undo()
+            grid[r][c] = 0
+        return smallest
+
+    bound = h_fn(grid, puzzle)
+    stats["iterations"] = 0
+    while bound is not None:
+        stats["iterations"] += 1
+        try:
+            found = probe(0, bound)
+        except Stopped:
+            stats["stopped"] = True
+            return None
+        if found is True:
+            path = [np.array(grid)]
+            for (r, c), _ in reversed(moves):
+                path.append(path[-1].copy())
+                path[-1][r][c] = 0
+            return path[::-1]
+        bound = found
+    return None
+
+def beam_search(grid, width, puzzle, stats, should_stop=None):
+    # Breadth-first by depth, keeping the `width` boards with the fewest cells
+    # left undecided by line propagation. Fast and bounded, but may miss.
+    size = len(grid)
+    nodes = [Node(pack(grid))]
+    layer = [0]
+    while layer:
+        if should_stop and should_stop():
+            stats["stopped"] = True
+            return None
+        grids = unpack_many([nodes[i].key for i in layer], size)
+        for row in np.flatnonzero(~(grids == 0).any(axis=1)):
+            if check_win(grids[row].reshape(size, size), puzzle):
+                return reconstruct_path(nodes, layer[row], size)
+        stats["expanded"] += len(layer)
+        scored, seen = [], set()
+        for row, cell, val, child in expand_layer(grids, size, puzzle):
+            key = nodes[layer[row]].key | val << 2 * cell
+            if key in seen:
+                continue
+            seen.add(key)
+            h = pattern_heuristic(child, puzzle)
+            if h is not None:
+                stats["generated"] += 1
+                scored.append((h, len(scored), key, layer[row], cell << 2 | val))
+        scored.sort()
+        layer = []
+        for _, _, key, parent, move in scored[:width]:
+            nodes.append(Node(key, parent, move))
+            layer.append(len(nodes) - 1)
+    return None
+
+@profiled
+def reconstruct_path(nodes, index, size):
+    moves = []
+    while nodes[index].parent >= 0:
+        moves.append(nodes[index].move)
+        index = nodes[index].parent
+    grid = unpack(nodes[index].key, size)
+    path = [grid]
+    for move in reversed(moves):
+        grid = grid.copy()
+        grid[divmod(move >> 2, size)] = move & 3
+        path.append(grid)
+    return path
+
+def solve(grid, puzzle, mode="astar", heuristic="lines", epsilon=0.0, width=64, tt=None, symmetry=False,
+          should_stop=None):
+    stats = {}
+    if symmetry and tt is None:
+        tt = TranspositionTable()
+    path = a_star_solver(grid, puzzle.locked, puzzle, stats, mode, heuristic, epsilon, width, tt, symmetry, should_stop)
+    if tt is not None:
+        stats.update(tt.report())
+    stats["path_length"] = len(path) if path else 0
+    return (path[-1] if path else None), stats
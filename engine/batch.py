@@ -0,0 +1,137 @@
+# Solve a stream of puzzles over a process pool.
+# Usage: python tango.py solve-batch [FILE|-] [--method sat] [--workers 8]
+#        [--order input|completion] [--out results.jsonl] [--cache solutions.sqlite]
+#        [--format auto|pack|json]
+#
+# Input is a binary .tngo pack (recognised by its magic bytes, not its name),
+# or JSON lines in the generator's record format ("size", "givens", "edges", optionally "grid" with pre-filled
+# cells, "solution" to verify against and "id"). Each result is one JSON line; a summary with
+# throughput and latency percentiles goes to stderr at the end.
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from functools import lru_cache
+from engine.api import ENGINES, solve
+from engine.cache import SolutionCache
+from engine.generate import from_record, record_grid
+from game.constraints import check_win
+from game.pack import Corpus, is_pack
+
+@lru_cache(maxsize=None)
+def _corpus(path):
+    # Each worker maps a pack once and then reads puzzle k directly.
+    return Corpus(path)
+
+@lru_cache(maxsize=None)
+def _cache(path):
+    # One connection per worker; SQLite serializes the writers.
+    return SolutionCache(path=path)
+
+def solve_line(task):
+    # task is (index, kind, source, method, cache): source is a JSON line for
+    # kind "json" and the pack's path for kind "pack"; cache is a SQLite path
+    # or None.
+    index, kind, source, method, cache_path = task
+    result = {"index": index}
+    try:
+        if kind == "pack":
+            corpus = _corpus(source)
+            puzzle, expected = corpus[index], corpus.solution(index)
+            grid = puzzle.initial_grid()
+        else:
+            record = json.loads(source)
+            result["id"] = record.get("id", index)
+            puzzle, expected = from_record(record)
+            grid = record_grid(puzzle, record)
+        solution, stats = solve(grid, puzzle, method, cache=_cache(cache_path) if cache_path else None)
+    except (ValueError, KeyError, TypeError, IndexError) as exc:
+        result["error"] = f"{type(exc).__name__}: {exc}"
+        return result
+    result["solved"] = stats.pop("solved")
+    result["time"] = stats.pop("time")
+    if solution is not None:
+        result["valid"] = bool(check_win(solution, puzzle))
+        result["solution"] = ["".join(" SM"[v] for v in row) for row in solution]
+        if expected is not None and len(expected):
+            result["matches"] = result["solution"] == ["".join(" SM"[v] for v in row) for row in expected]
+    result["stats"] = {k: v for k, v in stats.items() if isinstance(v, (int, float, str, bool))}
+    return result
+
+def percentile(values, q):
+    # Nearest-rank percentile of an already sorted list.
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tango.py solve-batch", description="Solve a file of puzzles")
+    parser.add_argument("input", nargs="?", default="-", help=".tngo pack or JSON-lines puzzle file (- for stdin)")
+    parser.add_argument("--format", choices=("auto", "pack", "json"), default="auto",
+                        help="input format (default: a .tngo pack if the file starts with its magic bytes, else JSON lines)")
+    parser.add_argument("--method", choices=list(ENGINES), default="lines")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--order", choices=("input", "completion"), default="input",
+                        help="emit results in input order or as soon as each finishes")
+    parser.add_argument("--chunksize", type=int, default=64, help="puzzles handed to a worker at a time")
+    parser.add_argument("--out", default="-", help="JSON-lines result file (- for stdout)")
+    parser.add_argument("--cache", metavar="PATH", help="SQLite solution cache shared by the workers and later runs")
+    args = parser.parse_args(argv)
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    fmt = args.format
+    if fmt == "auto":
+        try:
+            fmt = "pack" if args.input != "-" and is_pack(args.input) else "json"
+        except OSError as exc:
+            parser.error(f"could not read {args.input}: {exc}")
+    if fmt == "pack":
+        source = None
+        # workers get only the path and an index; they read the pack themselves
+        tasks = ((i, "pack", args.input, args.method, args.cache) for i in range(len(_corpus(args.input))))
+    else:
+        source = sys.stdin if args.input == "-" else open(args.input)
+        tasks = ((i, "json", line, args.method, args.cache) for i, line in enumerate(source) if line.strip())
+    latencies = []
+    counts = {"solved": 0, "unsolved": 0, "invalid": 0, "mismatched": 0, "errors": 0, "cached": 0}
+    start = time.perf_counter()
+    pool = mp.Pool(args.workers) if args.workers > 1 else None
+    if pool is None:
+        results = map(solve_line, tasks)
+    elif args.order == "input":
+        results = pool.imap(solve_line, tasks, args.chunksize)
+    else:
+        results = pool.imap_unordered(solve_line, tasks, args.chunksize)
+    for result in results:
+        out.write(json.dumps(result) + "\n")
+        if "error" in result:
+            counts["errors"] += 1
+            continue
+        latencies.append(result["time"])
+        counts["cached"] += bool(result["stats"].get("cached"))
+        counts["solved" if result["solved"] else "unsolved"] += 1
+        if result.get("valid") is False:
+            counts["invalid"] += 1
+        if result.get("matches") is False:
+            counts["mismatched"] += 1
+    if pool:
+        pool.close()
+        pool.join()
+    elapsed = time.perf_counter() - start
+    out.flush()
+    if out is not sys.stdout:
+        out.close()
+    if source not in (None, sys.stdin):
+        source.close()
+
+    total = len(latencies) + counts["errors"]
+    latencies.sort()
+    print(f"{total} puzzles in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.1f}/s) "
+          f"with {args.method} on {args.workers} worker(s)", file=sys.stderr)
+    print(", ".join(f"{k}: {v}" for k, v in counts.items()), file=sys.stderr)
+    print("latency ms: " + ", ".join(f"p{q} {percentile(latencies, q) * 1000:.2f}" for q in (50, 90, 99))
+          + f", max {(latencies[-1] if latencies else 0) * 1000:.2f}", file=sys.stderr)
+    return 1 if counts["errors"] or counts["invalid"] or counts["mismatched"] else 0
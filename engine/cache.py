@@ -0,0 +1,118 @@
+# Content-addressed solution cache: an in-memory LRU in front of an optional
+# SQLite file. Entries are keyed by a hash of the puzzle (size, givens,
+# edges), the board's current fill, the method and its options, and carry
+# the solver version that produced them; an entry from another version is
+# dropped on lookup.
+
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from game.pack import encode
+
+@lru_cache(maxsize=64)
+def _puzzle_bytes(puzzle):
+    # Puzzles are hashed by identity here, so a puzzle is packed once.
+    return puzzle.size.to_bytes(2, "little") + encode(puzzle).tobytes()
+
+def cache_key(grid, puzzle, method, options=None):
+    # Hex key of one solve, or None when an option (a callback, a table...)
+    # cannot be part of a key and the solve should not be cached.
+    options = options or {}
+    if not all(isinstance(v, (str, int, float, bool, type(None))) for v in options.values()):
+        return None
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{method}:{sorted(options.items())!r}".encode())
+    h.update(_puzzle_bytes(puzzle))
+    h.update(np.asarray(grid, dtype=np.uint8).tobytes())
+    return h.hexdigest()
+
+class SolutionCache:
+    def __init__(self, capacity=1024, path=None):
+        self.capacity = capacity
+        self.memory = OrderedDict()  # key -> (version, solution bytes or None, size, stats)
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, timeout=30)
+            self.db.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, version TEXT, "
+                            "size INTEGER, solution BLOB, stats TEXT, created REAL)")
+        self.hits = self.disk_hits = self.misses = self.stale = self.stores = 0
+
+    def get(self, key, version):
+        # (solution or None, stats) stored for key by this solver version;
+        # None on a miss. The caller gets its own copies.
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.memory.move_to_end(key)
+        elif self.db is not None:
+            row = self.db.execute("SELECT version, solution, size, stats FROM solutions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                entry = (row[0], row[1], row[2], json.loads(row[3]))
+                self._remember(key, entry)
+                self.disk_hits += 1
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] != version:
+            self.stale += 1
+            self.misses += 1
+            self.discard(key)
+            return None
+        self.hits += 1
+        _, solution, size, stats = entry
+        if solution is not None:
+            solution = np.frombuffer(solution, dtype=np.uint8).reshape(size, size).astype(int)
+        return solution, dict(stats)
+
+    def put(self, key, version, solution, stats):
+        stats = {k: v for k, v in stats.items() if isinstance(v, (str, int, float, bool, type(None)))}
+        size = 0 if solution is None else len(solution)
+        blob = None if solution is None else np.asarray(solution, dtype=np.uint8).tobytes()
+        self._remember(key, (version, blob, size, stats))
+        if self.db is not None:
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)",
+                                (key, version, size, blob, json.dumps(stats), time.time()))
+        self.stores += 1
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def discard(self, key):
+        self.memory.pop(key, None)
+        if self.db is not None:
+            with self.db:
+                self.db.execute("DELETE FROM solutions WHERE key = ?", (key,))
+
+    def invalidate(self, method, version):
+        # Drops every entry of `method` not made by `version` (versions are
+        # "method/N"), on disk too; returns how many went from disk.
+        prefix = method + "/"
+        for key in [k for k, e in self.memory.items() if e[0].startswith(prefix) and e[0] != version]:
+            del self.memory[key]
+        if self.db is None:
+            return 0
+        with self.db:
+            return self.db.execute("DELETE FROM solutions WHERE version LIKE ? AND version != ?",
+                                   (prefix + "%", version)).rowcount
+
+    def clear(self):
+        self.memory.clear()
+        if self.db is not None:
+            with self.db:
+                self.db.execute("DELETE FROM solutions")
+
+    def report(self):
+        return {"cache_hits": self.hits, "cache_disk_hits": self.disk_hits, "cache_misses": self.misses,
+                "cache_stale": self.stale, "cache_stores": self.stores, "cache_entries": len(self.memory)}
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
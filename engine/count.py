@@ -0,0 +1,141 @@
+# Solution counting on top of line-pattern propagation. Undecided cells are
+# split into independent components (rows and columns joined by the cells
+# they share), each counted separately and multiplied; component counts are
+# memoized on their lines' masks. A cap stops counting early, e.g. cap=2
+# answers "zero, one or many" for uniqueness checks. With symmetry, a
+# component shares its memo entry with its images under the puzzle's
+# symmetries (engine.zobrist), which equal counts on symmetric puzzles.
+
+from engine.lines import initial_state, propagate, fix_line
+from engine.zobrist import Zobrist, canonical_lines, symmetries
+from engine.instrument import profiled
+
+def _all_lines(n):
+    return [(True, i) for i in range(n)] + [(False, j) for j in range(n)]
+
+def _masks(state, line):
+    is_row, i = line
+    if is_row:
+        return state.row_s[i], state.row_m[i], state.row_cands[i]
+    return state.col_s[i], state.col_m[i], state.col_cands[i]
+
+def _undecided(state, line):
+    s, m, _ = _masks(state, line)
+    return ((1 << state.size) - 1) & ~(s | m)
+
+def components(state, lines):
+    # Groups the undecided lines among `lines` that share undecided cells.
+    open_lines = [line for line in lines if _undecided(state, line)]
+    parent = {line: line for line in open_lines}
+
+    def find(line):
+        while parent[line] != line:
+            parent[line] = parent[parent[line]]
+            line = parent[line]
+        return line
+
+    for line in open_lines:
+        if not line[0]:
+            continue
+        undecided = _undecided(state, line)
+        while undecided:
+            low = undecided & -undecided
+            undecided ^= low
+            a, b = find(line), find((False, low.bit_length() - 1))
+            if a != b:
+                parent[a] = b
+    groups = {}
+    for line in open_lines:
+        groups.setdefault(find(line), []).append(line)
+    return list(groups.values())
+
+def _count(state, lines, cap, stats, memo, key_of):
+    total = 1
+    for comp in components(state, lines):
+        total = min(cap, total * _count_component(state, comp, cap, stats, memo, key_of))
+        if not total:
+            return 0
+    return total
+
+def _count_component(state, comp, cap, stats, memo, key_of):
+    key = key_of(state, comp)
+    total = memo.get(key)
+    if total is not None:
+        stats["memo_hits"] += 1
+        return total
+    stats["components"] += 1
+    is_row, i = min(comp, key=lambda line: len(_masks(state, line)[2]))
+    total = 0
+    for p in _masks(state, (is_row, i))[2]:
+        stats["branches"] += 1
+        child = state.copy()
+        fix_line(child, is_row, i, p)
+        if propagate(child, [(not is_row, j) for j in range(state.size)], stats):
+            # always the full cap, so memoized counts mean the same everywhere
+            total += _count(child, comp, cap, stats, memo, key_of)
+            if total >= cap:
+                break
+    memo[key] = total = min(total, cap)
+    return total
+
+def exact_key(state, comp):
+    return tuple((line, _masks(state, line)[:2]) for line in comp)
+
+@profiled
+def count_solutions(grid, puzzle, cap=None, stats=None, tt=None, symmetry=False):
+    # Number of completions of grid, or cap once that many have been seen.
+    # tt: a TranspositionTable to memoize in instead of a dict private to
+    # this call; it may be shared between calls and puzzles.
+    if stats is None:
+        stats = {}
+    stats.update(line_revisions=0, forced_cells=0, branches=0, components=0, memo_hits=0)
+    cap = float("inf") if cap is None else cap
+    state = initial_state(grid, puzzle)
+    if not propagate(state, _all_lines(puzzle.size), stats):
+        return 0
+    key_of = exact_key
+    group = symmetries(puzzle) if symmetry else []
+    if len(group) > 1:
+        n = puzzle.size
+        key_of = lambda state, comp: canonical_lines([line + _masks(state, line)[:2] for line in comp], group, n)
+    if tt is not None:
+        salt, inner = Zobrist(puzzle).salt, key_of
+        key_of = lambda state, comp: (salt, cap, inner(state, comp))
+    return _count(state, _all_lines(puzzle.size), cap, stats, {} if tt is None else tt, key_of)
+
+def is_unique(grid, puzzle):
+    return count_solutions(grid, puzzle, cap=2) == 1
+
+def solutions(grid, puzzle, limit=None):
+    # Yields completed grids one by one (plain branching, no decomposition).
+    stats = {"line_revisions": 0, "forced_cells": 0}
+    state = initial_state(grid, puzzle)
+    if not propagate(state, _all_lines(puzzle.size), stats):
+        return
+    found = 0
+    stack = [state]
+    while stack:
+        state = stack.pop()
+        open_lines = [line for line in _all_lines(puzzle.size) if _undecided(state, line)]
+        if not open_lines:
+            yield state.to_grid(grid.copy())
+            found += 1
+            if limit is not None and found >= limit:
+                return
+            continue
+        is_row, i = min(open_lines, key=lambda line: len(_masks(state, line)[2]))
+        for p in reversed(_masks(state, (is_row, i))[2]):
+            child = state.copy()
+            fix_line(child, is_row, i, p)
+            if propagate(child, [(not is_row, j) for j in range(puzzle.size)], stats):
+                stack.append(child)
+
+def solve(grid, puzzle, cap=2, tt=None, symmetry=False):
+    # First solution plus the number of solutions (up to cap) in the stats.
+    stats = {}
+    count = count_solutions(grid, puzzle, cap, stats, tt, symmetry)
+    stats["solutions"] = count
+    stats["unique"] = count == 1
+    if not count:
+        return None, stats
+    return next(solutions(grid, puzzle, 1)), stats
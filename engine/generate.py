@@ -0,0 +1,183 @@
+# Unique-solution puzzle generator with difficulty grading.
+# Usage: python -m engine.generate --size 8 --count 1000 [--difficulty hard]
+#        [--seed 0] [--workers 8] [--out pack.jsonl | pack.tngo]
+#
+# A random full board starts out with every cell given plus a share of its
+# '=' / 'x' edges; clues are then dropped in random order whenever the
+# puzzle stays unique (and no harder than the requested difficulty).
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import sys
+import time
+from engine.count import is_unique
+from engine.lines import initial_state, propagate, search
+from engine.propagate import BOTH, DomainStore
+from game.pack import PackWriter
+from game.patterns import random_solution
+from game.puzzle import Puzzle
+
+DIFFICULTIES = ("easy", "medium", "hard", "expert")
+HARD_BRANCHES = 8  # line-search branches above which a puzzle is "expert"
+
+def grade(puzzle):
+    # easy: the local rules (edges, no three in a row, N/2 per line) solve it
+    # cell by cell; medium: whole-line pattern reasoning is needed; hard and
+    # expert: guessing is needed, graded by the line search's branch count.
+    grid = puzzle.initial_grid()
+    store = DomainStore(grid, puzzle)
+    if store.propagate() and BOTH not in store.domains:
+        return "easy", 0
+    n = puzzle.size
+    stats = {"line_revisions": 0, "forced_cells": 0, "branches": 0}
+    state = initial_state(grid, puzzle)
+    propagate(state, [(True, i) for i in range(n)] + [(False, j) for j in range(n)], stats)
+    full = (1 << n) - 1
+    if all(s | m == full for s, m in zip(state.row_s, state.row_m)):
+        return "medium", 0
+    search(state, stats)
+    return ("hard" if stats["branches"] <= HARD_BRANCHES else "expert"), stats["branches"]
+
+def _edges(solution, rng, edge_ratio):
+    # At most one edge per cell, matching the constraints dict's layout.
+    n = len(solution)
+    edges = {}
+    for r in range(n):
+        for c in range(n):
+            options = [(d, r2, c2) for d, r2, c2 in (('H', r, c + 1), ('V', r + 1, c)) if r2 < n and c2 < n]
+            if options and rng.random() < edge_ratio:
+                d, r2, c2 = rng.choice(options)
+                edges[(r, c)] = ('=' if solution[r][c] == solution[r2][c2] else 'x', d)
+    return edges
+
+def generate_puzzle(size, rng=None, difficulty=None, edge_ratio=0.25, attempts=100):
+    # Returns (puzzle, solution, grade, branches). With a difficulty, removals
+    # that would make the puzzle harder are skipped and boards that end up too
+    # easy are thrown away, up to `attempts` times.
+    rng = rng or random.Random()
+    target = DIFFICULTIES.index(difficulty) if difficulty else len(DIFFICULTIES) - 1
+    for _ in range(attempts):
+        solution = random_solution(size, rng)
+        locked = {(r, c): solution[r][c] for r in range(size) for c in range(size)}
+        edges = _edges(solution, rng, edge_ratio)
+        clues = [("cell", cell) for cell in locked] + [("edge", cell) for cell in edges]
+        rng.shuffle(clues)
+        label, branches = "easy", 0
+        for kind, cell in clues:
+            pool = locked if kind == "cell" else edges
+            value = pool.pop(cell)
+            puzzle = Puzzle(locked, edges, size)
+            if is_unique(puzzle.initial_grid(), puzzle):
+                new_label, new_branches = grade(puzzle)
+                if DIFFICULTIES.index(new_label) <= target:
+                    label, branches = new_label, new_branches
+                    continue
+            pool[cell] = value
+        if difficulty is None or label == difficulty:
+            return Puzzle(locked, edges, size), solution, label, branches
+    return None
+
+def to_record(puzzle, solution, **extra):
+    record = dict(extra, size=puzzle.size,
+                  givens=[[r, c, v] for (r, c), v in sorted(puzzle.locked.items())],
+                  edges=[[r, c, s, d] for (r, c), (s, d) in sorted(puzzle.constraints.items())],
+                  solution=["".join(" SM"[v] for v in row) for row in solution])
+    return record
+
+def parse_rows(rows):
+    # Rows as strings of S / M and '.' or ' ' for empty, or as lists of 0/1/2.
+    return [[" SM".index(ch) if ch != "." else 0 for ch in row] if isinstance(row, str) else list(row)
+            for row in rows]
+
+def from_record(record):
+    locked = {(r, c): v for r, c, v in record.get("givens", [])}
+    edges = {(r, c): (s, d) for r, c, s, d in record.get("edges", [])}
+    size = record.get("size") or len(record["grid"])
+    return Puzzle(locked, edges, size), parse_rows(record.get("solution", []))
+
+def record_grid(puzzle, record):
+    # The puzzle's start grid plus any cells the record's "grid" fills in.
+    grid = puzzle.initial_grid()
+    for r, row in enumerate(parse_rows(record.get("grid", []))):
+        for c, val in enumerate(row):
+            if val and (r, c) not in puzzle.locked:
+                grid[r][c] = val
+    return grid
+
+def load_puzzles(path):
+    # Yields (puzzle, solution, record) for each line of a JSON-lines pack.
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield from_record(record) + (record,)
+
+def task_seed(seed, size, index):
+    # Same puzzle for the same (seed, size, index) whatever the worker count.
+    return f"{seed}:{size}:{index}"
+
+def _task(args):
+    index, size, seed, difficulty, edge_ratio, attempts = args
+    result = generate_puzzle(size, random.Random(task_seed(seed, size, index)), difficulty, edge_ratio, attempts)
+    if result is None:
+        return None
+    puzzle, solution, label, branches = result
+    return to_record(puzzle, solution, id=index, seed=task_seed(seed, size, index),
+                     difficulty=label, branches=branches)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate unique-solution Tango puzzles")
+    parser.add_argument("--size", type=int, default=6)
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, default=None,
+                        help="only keep puzzles of this grade (default: any)")
+    parser.add_argument("--edge-ratio", type=float, default=0.25,
+                        help="share of cells that start with an '=' / 'x' edge")
+    parser.add_argument("--attempts", type=int, default=100,
+                        help="boards to try per puzzle before giving up on --difficulty")
+    parser.add_argument("--seed", default="0", help="pack seed; puzzle i uses seed:size:i")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="-",
+                        help="output file: JSON lines (- for stdout), or a binary pack if it ends in .tngo")
+    args = parser.parse_args()
+    if args.size < 4 or args.size % 2:
+        parser.error("--size must be an even number of at least 4")
+
+    packed = args.out.endswith(".tngo")
+    if packed:
+        out = PackWriter(args.out, args.size)
+    else:
+        out = sys.stdout if args.out == "-" else open(args.out, "w")
+    tasks = [(i, args.size, args.seed, args.difficulty, args.edge_ratio, args.attempts) for i in range(args.count)]
+    grades = dict.fromkeys(DIFFICULTIES, 0)
+    failed = 0
+    start = time.perf_counter()
+    pool = mp.Pool(args.workers) if args.workers > 1 else None
+    # imap keeps pack order, so a pack is reproducible line for line
+    results = pool.imap(_task, tasks, chunksize=max(1, min(16, args.count // (4 * args.workers)))) if pool else map(_task, tasks)
+    for record in results:
+        if record is None:
+            failed += 1
+            continue
+        if packed:
+            out.add(*from_record(record))
+        else:
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+        grades[record["difficulty"]] += 1
+    if pool:
+        pool.close()
+        pool.join()
+    elapsed = time.perf_counter() - start
+    if out is not sys.stdout:
+        out.close()
+    made = args.count - failed
+    print(f"{made} puzzles of {args.size}x{args.size} in {elapsed:.1f}s ({made / elapsed:.1f}/s); "
+          + ", ".join(f"{k}: {v}" for k, v in grades.items())
+          + (f"; {failed} gave up on the difficulty" if failed else ""), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Opt-in profiling of solves: call counts and wall time for the rule checks
+# and each engine's main phases.
+#
+#     with recording() as recorder:
+#         solve(grid, puzzle, "ac3")
+#     print(format_report(recorder.report()))
+#
+# The measured functions are marked with @profiled where they are defined, so
+# every caller (closures, bound methods, tables of functions) goes through
+# the same wrapper. Outside a recording the wrapper only checks that none is
+# active. Times are inclusive and only the outermost call of a recursive
+# function is timed. A recording counts calls from every thread (a window's
+# solver worker and its UI thread alike); nesting is tracked per thread.
+
+import functools
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+current = None
+
+class Recorder:
+    def __init__(self):
+        self.calls = Counter()
+        self.seconds = defaultdict(float)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+    def call(self, name, fn, args, kwargs):
+        active = self.local.__dict__.setdefault("active", set())
+        if name in active:
+            with self.lock:
+                self.calls[name] += 1
+            return fn(*args, **kwargs)
+        active.add(name)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            active.discard(name)
+            with self.lock:
+                self.calls[name] += 1
+                self.seconds[name] += elapsed
+
+    def report(self):
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+        with self.lock:
+            return {"elapsed": elapsed, "calls": dict(self.calls), "seconds": dict(self.seconds)}
+
+def profiled(fn):
+    # Reported as "<module>.<qualified name>", e.g. "propagate.DomainStore.propagate".
+    name = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        recorder = current
+        if recorder is None:
+            return fn(*args, **kwargs)
+        return recorder.call(name, fn, args, kwargs)
+    return wrapper
+
+@contextmanager
+def recording():
+    global current
+    if current is not None:
+        raise RuntimeError("a recording is already active")
+    current = recorder = Recorder()
+    try:
+        yield recorder
+    finally:
+        recorder.elapsed = time.perf_counter() - recorder.started
+        current = None
+
+def format_report(report):
+    elapsed = report["elapsed"]
+    lines = [f"{'function':<40} {'calls':>10} {'ms':>10} {'% time':>7}"]
+    for name, calls in sorted(report["calls"].items(), key=lambda item: -report["seconds"].get(item[0], 0)):
+        seconds = report["seconds"].get(name, 0.0)
+        share = seconds / elapsed * 100 if elapsed else 0.0
+        lines.append(f"{name:<40} {calls:>10} {seconds * 1000:>10.2f} {share:>6.1f}%")
+    lines.append(f"{'total':<40} {'':>10} {elapsed * 1000:>10.2f}")
+    return "\n".join(lines)
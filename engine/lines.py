@@ -0,0 +1,169 @@
+# Line-pattern propagation: every row and column keeps the complete line
+# patterns still compatible with its known cells and '=' / 'x' edges; cells
+# shared by all remaining patterns are forced. Lines are revised to a
+# fixpoint, branching on the tightest line only when propagation stalls.
+
+from functools import lru_cache
+from game.patterns import line_patterns
+from engine.instrument import profiled
+
+class LineState:
+    def __init__(self, size, row_s, row_m, col_s, col_m, row_cands, col_cands):
+        self.size = size
+        self.row_s, self.row_m = row_s, row_m
+        self.col_s, self.col_m = col_s, col_m
+        self.row_cands, self.col_cands = row_cands, col_cands
+
+    def copy(self):
+        return LineState(self.size, self.row_s[:], self.row_m[:], self.col_s[:], self.col_m[:],
+                         self.row_cands[:], self.col_cands[:])
+
+    def to_grid(self, grid):
+        for i in range(self.size):
+            for j in range(self.size):
+                grid[i][j] = 1 if self.row_s[i] >> j & 1 else 2 if self.row_m[i] >> j & 1 else 0
+        return grid
+
+def edge_filter(patterns, eq, x):
+    # Keep patterns where '=' pairs match and 'x' pairs differ (bit k vs k+1).
+    return [p for p in patterns if not ((p ^ (p >> 1)) & eq) and (p ^ (p >> 1)) & x == x]
+
+@lru_cache(maxsize=None)
+def line_candidates(size, eq, x):
+    return tuple(edge_filter(line_patterns(size), eq, x))
+
+@profiled
+def initial_state(grid, puzzle):
+    n = puzzle.size
+    row_s, row_m, col_s, col_m = [0] * n, [0] * n, [0] * n, [0] * n
+    for i in range(n):
+        for j in range(n):
+            if grid[i][j] == 1:
+                row_s[i] |= 1 << j
+                col_s[j] |= 1 << i
+            elif grid[i][j] == 2:
+                row_m[i] |= 1 << j
+                col_m[j] |= 1 << i
+    row_cands = [line_candidates(n, puzzle.eq_h[i], puzzle.x_h[i]) for i in range(n)]
+    col_cands = [line_candidates(n, puzzle.eq_v[j], puzzle.x_v[j]) for j in range(n)]
+    return LineState(n, row_s, row_m, col_s, col_m, row_cands, col_cands)
+
+@profiled
+def propagate(state, queue, stats):
+    # queue holds (is_row, index); returns False on a line with no patterns.
+    n = state.size
+    full = (1 << n) - 1
+    pending = set(queue)
+    queue = list(pending)
+    while queue:
+        line = queue.pop()
+        pending.discard(line)
+        is_row, i = line
+        if is_row:
+            s, m, cands = state.row_s[i], state.row_m[i], state.row_cands[i]
+        else:
+            s, m, cands = state.col_s[i], state.col_m[i], state.col_cands[i]
+        stats["line_revisions"] += 1
+        cands = [p for p in cands if not (p & m) and not (s & ~p)]
+        if not cands:
+            return False
+        sure_s, sure_m = full, full
+        for p in cands:
+            sure_s &= p
+            sure_m &= full ^ p
+        new_s, new_m = sure_s & ~s, sure_m & ~m
+        if is_row:
+            state.row_cands[i] = cands
+            state.row_s[i] |= new_s
+            state.row_m[i] |= new_m
+        else:
+            state.col_cands[i] = cands
+            state.col_s[i] |= new_s
+            state.col_m[i] |= new_m
+        for bits, sun in ((new_s, True), (new_m, False)):
+            while bits:
+                low = bits & -bits
+                j = low.bit_length() - 1
+                bits ^= low
+                stats["forced_cells"] += 1
+                if is_row:
+                    if sun:
+                        state.col_s[j] |= 1 << i
+                    else:
+                        state.col_m[j] |= 1 << i
+                else:
+                    if sun:
+                        state.row_s[j] |= 1 << i
+                    else:
+                        state.row_m[j] |= 1 << i
+                cross = (not is_row, j)
+                if cross not in pending:
+                    pending.add(cross)
+                    queue.append(cross)
+    return True
+
+def _branch_line(state):
+    # Undecided line with the fewest remaining patterns, or None when solved.
+    full = (1 << state.size) - 1
+    best, best_count = None, None
+    for i in range(state.size):
+        if state.row_s[i] | state.row_m[i] != full:
+            count = len(state.row_cands[i])
+            if best is None or count < best_count:
+                best, best_count = (True, i), count
+        if state.col_s[i] | state.col_m[i] != full:
+            count = len(state.col_cands[i])
+            if best is None or count < best_count:
+                best, best_count = (False, i), count
+    return best
+
+def fix_line(state, is_row, i, p):
+    full = (1 << state.size) - 1
+    if is_row:
+        state.row_cands[i] = [p]
+        state.row_s[i], state.row_m[i] = p, full ^ p
+        cross_s, cross_m = state.col_s, state.col_m
+    else:
+        state.col_cands[i] = [p]
+        state.col_s[i], state.col_m[i] = p, full ^ p
+        cross_s, cross_m = state.row_s, state.row_m
+    for j in range(state.size):
+        if p >> j & 1:
+            cross_s[j] |= 1 << i
+        else:
+            cross_m[j] |= 1 << i
+
+@profiled
+def search(state, stats, on_step=None):
+    line = _branch_line(state)
+    if line is None:
+        return state
+    is_row, i = line
+    for p in (state.row_cands[i] if is_row else state.col_cands[i]):
+        stats["branches"] += 1
+        child = state.copy()
+        fix_line(child, is_row, i, p)
+        # the pattern fixes every cell of the line, so every crossing line is touched
+        queue = [(not is_row, j) for j in range(state.size)]
+        if propagate(child, queue, stats):
+            if on_step:
+                on_step(child)
+            solved = search(child, stats, on_step)
+            if solved is not None:
+                return solved
+    return None
+
+def solve(grid, puzzle, on_step=None):
+    # Fills grid in place; on_step(state) fires after each propagation round.
+    stats = {"line_revisions": 0, "forced_cells": 0, "branches": 0}
+    n = puzzle.size
+    state = initial_state(grid, puzzle)
+    queue = [(True, i) for i in range(n)] + [(False, j) for j in range(n)]
+    if not propagate(state, queue, stats):
+        return None, stats
+    if on_step:
+        on_step(state)
+    solved = search(state, stats, on_step)
+    if solved is None:
+        return None, stats
+    return solved.to_grid(grid), stats
@@ -0,0 +1,183 @@
+# Bitset domains for every cell and propagators for the puzzle's constraints,
+# woken through per-cell watch lists. A domain is a 2-bit set: SUN, MOON or
+# BOTH; pre-filled cells start as singletons. Changes are recorded on a trail
+# so search can roll them back with mark()/undo().
+
+from collections import deque
+from engine.instrument import profiled
+
+SUN, MOON, BOTH = 1, 2, 3
+
+EQUAL, DIFFERENT, WINDOW, LINE = range(4)
+
+class DomainStore:
+    def __init__(self, grid, puzzle):
+        n = puzzle.size
+        self.puzzle = puzzle
+        self.size = n
+        self.limit = puzzle.limit
+        self.domains = [BOTH] * (n * n)
+        for r in range(n):
+            for c in range(n):
+                if grid[r][c]:
+                    self.domains[r * n + c] = int(grid[r][c])
+        for (r, c), val in puzzle.locked.items():
+            self.domains[r * n + c] = val
+        self.props = []
+        self.watch = [[] for _ in range(n * n)]
+        for (r, c), (symbol, direction) in puzzle.constraints.items():
+            other = r * n + c + 1 if direction == 'H' else (r + 1) * n + c
+            self._add(EQUAL if symbol == '=' else DIFFERENT, (r * n + c, other))
+        lines = [[i * n + j for j in range(n)] for i in range(n)]
+        lines += [[i * n + j for i in range(n)] for j in range(n)]
+        for line in lines:
+            for k in range(n - 2):
+                self._add(WINDOW, tuple(line[k:k + 3]))
+            self._add(LINE, tuple(line))
+        self.trail = []
+        # wipe-out counts per propagator, used by search to weight its choices
+        self.weights = [1] * len(self.props)
+
+    def _add(self, kind, cells):
+        index = len(self.props)
+        self.props.append((kind, cells))
+        for cell in cells:
+            self.watch[cell].append(index)
+
+    def value(self, cell):
+        d = self.domains[cell]
+        return d if d != BOTH else 0
+
+    def set(self, cell, domain):
+        old = self.domains[cell]
+        if domain != old:
+            self.trail.append((cell, old))
+            self.domains[cell] = domain
+
+    def mark(self):
+        return len(self.trail)
+
+    def undo(self, mark):
+        trail, domains = self.trail, self.domains
+        while len(trail) > mark:
+            cell, old = trail.pop()
+            domains[cell] = old
+
+    def _run(self, kind, cells, changed):
+        # Narrows the domains of one propagator's cells; returns False on a wipe-out.
+        d = self.domains
+        if kind == EQUAL:
+            a, b = cells
+            both = d[a] & d[b]
+            if not both:
+                return False
+            for cell in cells:
+                if d[cell] != both:
+                    self.set(cell, both)
+                    changed.append(cell)
+        elif kind == DIFFERENT:
+            a, b = cells
+            for x, y in ((a, b), (b, a)):
+                if d[x] != BOTH and d[y] & d[x]:
+                    left = d[y] & ~d[x] & BOTH
+                    if not left:
+                        return False
+                    self.set(y, left)
+                    changed.append(y)
+        elif kind == WINDOW:
+            a, b, c = cells
+            for x, y, z in ((a, b, c), (a, c, b), (b, c, a)):
+                if d[x] == d[y] != BOTH and d[z] & d[x]:
+                    left = d[z] & ~d[x] & BOTH
+                    if not left:
+                        return False
+                    self.set(z, left)
+                    changed.append(z)
+        else:
+            suns = moons = 0
+            for cell in cells:
+                if d[cell] == SUN:
+                    suns += 1
+                elif d[cell] == MOON:
+                    moons += 1
+            if suns > self.limit or moons > self.limit:
+                return False
+            if suns == self.limit or moons == self.limit:
+                rest = MOON if suns == self.limit else SUN
+                for cell in cells:
+                    if d[cell] == BOTH:
+                        self.set(cell, rest)
+                        changed.append(cell)
+        return True
+
+    @profiled
+    def propagate(self, cells=None, stats=None, on_change=None):
+        # Runs the propagators watching `cells` (all of them when None) until
+        # nothing changes. Returns False if some domain becomes empty.
+        if cells is None:
+            queue = deque(range(len(self.props)))
+        else:
+            queue = deque(dict.fromkeys(p for cell in cells for p in self.watch[cell]))
+        queued = set(queue)
+        props, watch = self.props, self.watch
+        while queue:
+            index = queue.popleft()
+            queued.discard(index)
+            kind, cells = props[index]
+            changed = []
+            ok = self._run(kind, cells, changed)
+            if stats is not None:
+                stats["revise_calls"] += 1
+                stats["domain_reductions"] += len(changed)
+            if not ok:
+                self.weights[index] += 1
+                return False
+            for cell in changed:
+                if on_change:
+                    on_change(cell)
+                for other in watch[cell]:
+                    if other != index and other not in queued:
+                        queued.add(other)
+                        queue.append(other)
+        return True
+
+    @profiled
+    def forward_check(self, cell, stats=None):
+        # One pass over the propagators watching cell, without cascading.
+        for index in self.watch[cell]:
+            kind, cells = self.props[index]
+            changed = []
+            ok = self._run(kind, cells, changed)
+            if stats is not None:
+                stats["revise_calls"] += 1
+                stats["domain_reductions"] += len(changed)
+            if not ok:
+                self.weights[index] += 1
+                return False
+        return True
+
+class HashedDomainStore(DomainStore):
+    # A DomainStore that keeps the Zobrist hashes of its domains current
+    # through set() and undo(), so search can look positions up in a
+    # transposition table without rehashing the board.
+    def __init__(self, grid, puzzle, zobrist):
+        super().__init__(grid, puzzle)
+        self.zobrist = zobrist
+        self.hashes = zobrist.hashes(self.domains)
+
+    def key(self):
+        return min(self.hashes)
+
+    def set(self, cell, domain):
+        old = self.domains[cell]
+        if domain != old:
+            self.trail.append((cell, old))
+            self.domains[cell] = domain
+            self.hashes = self.zobrist.update(self.hashes, cell, old, domain)
+
+    def undo(self, mark):
+        trail, domains, update = self.trail, self.domains, self.zobrist.update
+        while len(trail) > mark:
+            cell, old = trail.pop()
+            self.hashes = update(self.hashes, cell, domains[cell], old)
+            domains[cell] = old
@@ -0,0 +1,334 @@
+# Q-learning with function approximation: Q(board, cell, value) is a linear
+# model (or a small MLP) over a fixed set of board features, so memory does
+# not grow with the boards seen and one model serves every puzzle and size.
+# Unlike engine.qlearn the agent picks the cell as well as the value.
+#
+# Training: python -m engine.qapprox --episodes 3000 --model model.npz
+#     [--kind linear|mlp] [--pack PATH | --size N --seed S] [--puzzles 20]
+#     [--alpha 0.1:0.01] [--epsilon 0.3:0.02] [--halflife 750]
+#     [--gamma 0.9] [--batch 64] [--report 100]
+# The model is loaded from --model when it exists and saved back afterwards;
+# engine.api.solve(grid, puzzle, "qapprox", model="model.npz") runs it as a
+# greedy policy.
+
+import argparse
+import math
+import numpy as np
+import random
+import time
+from functools import lru_cache
+from engine.lines import line_candidates
+from game.constraints import _line_ok, bitboards, check_win, popcount
+from game.pack import DEFAULT_PACK, Corpus
+from engine.instrument import profiled
+
+N_FEATURES = 21
+REWARD_INVALID, REWARD_DEAD, REWARD_STEP, REWARD_WIN = -5, -10, 1, 100
+
+@lru_cache(maxsize=65536)
+def completions(size, eq, x, s, m):
+    # Complete line patterns still compatible with the placed suns/moons.
+    return sum(1 for p in line_candidates(size, eq, x) if p & s == s and not p & m)
+
+def _placed(bb, puzzle, r, c, a):
+    # Row and column masks (suns, moons) with value a placed at (r, c).
+    row_s, row_m, col_s, col_m = bb
+    rs, rm, cs, cm = row_s[r], row_m[r], col_s[c], col_m[c]
+    if a == 0:
+        return rs | 1 << c, rm, cs | 1 << r, cm
+    return rs, rm | 1 << c, cs, cm | 1 << r
+
+@profiled
+def features(bb, puzzle, cells, progress):
+    # Rows 2k and 2k + 1 describe placing a sun and a moon at cells[k]. Every
+    # feature lies in [0, 1], whatever the board size.
+    n, limit = puzzle.size, puzzle.limit
+    norm = math.log1p(len(line_candidates(n, 0, 0)))
+    X = np.zeros((2 * len(cells), N_FEATURES))
+    for k, (r, c) in enumerate(cells):
+        eq_h, x_h, eq_v, x_v = puzzle.eq_h[r], puzzle.x_h[r], puzzle.eq_v[c], puzzle.x_v[c]
+        lines = [_placed(bb, puzzle, r, c, a) for a in (0, 1)]
+        ok = [_line_ok(rs, rm, eq_h, x_h, limit) and _line_ok(cs, cm, eq_v, x_v, limit) for rs, rm, cs, cm in lines]
+        comps = [(completions(n, eq_h, x_h, rs, rm), completions(n, eq_v, x_v, cs, cm)) for rs, rm, cs, cm in lines]
+        for a in (0, 1):
+            rs, rm, cs, cm = lines[a]
+            own_r, other_r, own_c, other_c = (rs, rm, cs, cm) if a == 0 else (rm, rs, cm, cs)
+            kr, kc = comps[a]
+            ko = min(comps[1 - a])
+            # neighbours (left, right, up, down) and the cell beyond each
+            same = other = same_pairs = other_pairs = kept = broken = 0
+            for k1, k2, bit, eq, x, own, opp in ((c - 1, c - 2, c - 1, eq_h, x_h, own_r, other_r),
+                                                 (c + 1, c + 2, c, eq_h, x_h, own_r, other_r),
+                                                 (r - 1, r - 2, r - 1, eq_v, x_v, own_c, other_c),
+                                                 (r + 1, r + 2, r, eq_v, x_v, own_c, other_c)):
+                if not 0 <= k1 < n:
+                    continue
+                far = 0 <= k2 < n
+                if own >> k1 & 1:
+                    same += 1
+                    same_pairs += far and own >> k2 & 1
+                elif opp >> k1 & 1:
+                    other += 1
+                    other_pairs += far and opp >> k2 & 1
+                else:
+                    continue
+                # edge to a filled neighbour: kept or broken by this value
+                match = own >> k1 & 1
+                if eq >> bit & 1:
+                    kept += match
+                    broken += 1 - match
+                elif x >> bit & 1:
+                    kept += 1 - match
+                    broken += match
+            X[2 * k + a] = (1.0,
+                            popcount(own_r) / limit, popcount(own_c) / limit,
+                            popcount(other_r) / limit, popcount(other_c) / limit,
+                            _line_ok(rs, rm, eq_h, x_h, limit), _line_ok(cs, cm, eq_v, x_v, limit),
+                            math.log1p(kr) / norm, math.log1p(kc) / norm, kr > 0, kc > 0,
+                            ok[1 - a] and ko > 0, math.log1p(ko) / norm,
+                            same / 4, other / 4, same_pairs / 4, other_pairs / 4,
+                            kept / 4, broken / 4, progress, a)
+    return X
+
+class LinearQ:
+    kind = "linear"
+
+    def __init__(self, n_features=N_FEATURES):
+        self.w = np.zeros(n_features)
+
+    def predict(self, X):
+        return X @ self.w
+
+    def fit(self, X, targets, lr):
+        # One gradient step on the batch's mean squared error.
+        self.w += lr * (targets - X @ self.w) @ X / len(X)
+
+    def arrays(self):
+        return {"w": self.w}
+
+class MLPQ:
+    kind = "mlp"
+
+    def __init__(self, n_features=N_FEATURES, hidden=16, rng=None):
+        # drawn from the global state so random.seed() makes models reproducible
+        rng = rng or np.random.default_rng(random.getrandbits(64))
+        self.w1 = rng.normal(0, 1 / math.sqrt(n_features), (n_features, hidden))
+        self.b1 = np.zeros(hidden)
+        self.w2 = rng.normal(0, 1 / math.sqrt(hidden), hidden)
+        self.b2 = np.zeros(1)
+
+    def predict(self, X):
+        return np.tanh(X @ self.w1 + self.b1) @ self.w2 + self.b2[0]
+
+    def fit(self, X, targets, lr):
+        h = np.tanh(X @ self.w1 + self.b1)
+        err = (h @ self.w2 + self.b2[0] - targets) / len(X)
+        dh = np.outer(err, self.w2) * (1 - h * h)
+        self.w2 -= lr * h.T @ err
+        self.b2 -= lr * err.sum()
+        self.w1 -= lr * X.T @ dh
+        self.b1 -= lr * dh.sum(axis=0)
+
+    def arrays(self):
+        return {"w1": self.w1, "b1": self.b1, "w2": self.w2, "b2": self.b2}
+
+MODELS = {"linear": LinearQ, "mlp": MLPQ}
+
+def save_model(model, path):
+    np.savez(path, kind=model.kind, **model.arrays())
+
+def load_model(path):
+    with np.load(path) as data:
+        model = MODELS[str(data["kind"])]()
+        for name in model.arrays():
+            setattr(model, name, data[name].astype(np.float64))
+    return model
+
+@profiled
+def episode(model, puzzle, grid, epsilon, rng, max_steps=None, record=None):
+    # One rollout from grid, filled in place. Each step the model picks a
+    # (cell, value) among all empty cells; a move that breaks a rule is
+    # undone and ruled out until the next valid move. The board is a dead end
+    # once some empty cell has no value left that its row and column can be
+    # completed with. record(x, reward, next_X) gets every transition, next_X
+    # None when it is terminal. Returns (solved, steps).
+    p = puzzle
+    bb = [list(masks) for masks in bitboards(grid, p)]
+    row_s, row_m, col_s, col_m = bb
+    cells = [(r, c) for r in range(p.size) for c in range(p.size) if not grid[r][c]]
+    total = len(cells)
+    if not total:
+        return check_win(grid, p), 0
+    max_steps = max_steps or 3 * total
+    X = features(bb, p, cells, 0.0)
+    failed = set()
+    steps = 0
+    while steps < max_steps:
+        steps += 1
+        choices = [i for i in range(len(X)) if i not in failed]
+        if rng.random() < epsilon:
+            i = rng.choice(choices)
+        else:
+            q = model.predict(X[choices])
+            i = choices[rng.choice(np.flatnonzero(q == q.max()))]
+        k, a = divmod(i, 2)
+        r, c = cells[k]
+        rs, rm, cs, cm = _placed(bb, p, r, c, a)
+        if not (_line_ok(rs, rm, p.eq_h[r], p.x_h[r], p.limit) and _line_ok(cs, cm, p.eq_v[c], p.x_v[c], p.limit)):
+            if record:
+                record(X[i], REWARD_INVALID, None)
+            failed.add(i)
+            if len(failed) == len(X):
+                return False, steps
+            continue
+        row_s[r], row_m[r], col_s[c], col_m[c] = rs, rm, cs, cm
+        grid[r][c] = a + 1
+        failed.clear()
+        del cells[k]
+        if not cells:
+            if record:
+                record(X[i], REWARD_WIN, None)
+            return True, steps
+        next_X = features(bb, p, cells, 1 - len(cells) / total)
+        # columns 9-12: this value completable in row and column, other value possible
+        dead = ((next_X[0::2, 9] * next_X[0::2, 10] == 0) & (next_X[1::2, 9] * next_X[1::2, 10] == 0)).any()
+        if dead:
+            if record:
+                record(X[i], REWARD_DEAD, None)
+            return False, steps
+        if record:
+            record(X[i], REWARD_STEP, next_X)
+        X = next_X
+    return False, steps
+
+def decay(start, end, halflife, t):
+    return end + (start - end) * 0.5 ** (t / halflife)
+
+@profiled
+def train(model, puzzles, episodes, alpha=(0.1, 0.01), epsilon=(0.3, 0.02), halflife=750, gamma=0.9,
+          batch=64, rng=None, report=None, report_every=100):
+    # Episodes on puzzles picked at random. Transitions are collected and fit
+    # `batch` at a time, with targets from the model as it stands at that
+    # point. report(row) gets a progress dict every report_every episodes.
+    rng = rng or random.Random(random.getrandbits(64))
+    xs, rewards, nexts = [], [], []
+    lr = alpha[0]
+
+    def record(x, reward, next_X):
+        xs.append(x)
+        rewards.append(reward)
+        nexts.append(next_X)
+        if len(xs) >= batch:
+            flush()
+
+    def flush():
+        # target: reward plus the discounted best move of the next board
+        targets = np.array(rewards, dtype=float)
+        live = [i for i, nx in enumerate(nexts) if nx is not None]
+        if live:
+            q = model.predict(np.concatenate([nexts[i] for i in live]))
+            starts = np.cumsum([0] + [len(nexts[i]) for i in live[:-1]])
+            targets[live] += gamma * np.maximum.reduceat(q, starts)
+        model.fit(np.array(xs), targets, lr)
+        xs.clear()
+        rewards.clear()
+        nexts.clear()
+
+    stats = {"episodes": 0, "solved": 0, "steps": 0}
+    window_solved = window_steps = 0
+    start = window_start = time.perf_counter()
+    for t in range(episodes):
+        eps = decay(epsilon[0], epsilon[1], halflife, t)
+        lr = decay(alpha[0], alpha[1], halflife, t)
+        puzzle = rng.choice(puzzles)
+        solved, steps = episode(model, puzzle, puzzle.initial_grid(), eps, rng, record=record)
+        stats["episodes"] += 1
+        stats["solved"] += solved
+        stats["steps"] += steps
+        window_solved += solved
+        window_steps += steps
+        if report and (t + 1) % report_every == 0:
+            now = time.perf_counter()
+            report({"episode": t + 1, "episodes_per_s": report_every / (now - window_start),
+                    "solve_rate": window_solved / report_every, "steps_per_episode": window_steps / report_every,
+                    "epsilon": eps, "alpha": lr})
+            window_solved = window_steps = 0
+            window_start = now
+    if xs:
+        flush()
+    stats["time"] = time.perf_counter() - start
+    return stats
+
+def solve(grid, puzzle, model=None, max_retries=30, epsilon=0.05, seed=None):
+    # Greedy rollout from grid with the model (or the .npz path of one), then
+    # up to max_retries - 1 slightly exploring ones if that fails.
+    if model is None or isinstance(model, str):
+        model = load_model(model) if model else LinearQ()
+    rng = random.Random(random.getrandbits(64) if seed is None else seed)
+    stats = {"episodes": 0, "steps": 0}
+    for attempt in range(max_retries):
+        work = grid.copy()
+        solved, steps = episode(model, puzzle, work, epsilon if attempt else 0.0, rng)
+        stats["episodes"] += 1
+        stats["steps"] += steps
+        if solved:
+            return work, stats
+    return None, stats
+
+def training_puzzles(pack, count, size=None, seed=None):
+    if size:
+        from engine.generate import generate_puzzle, task_seed
+        return [generate_puzzle(size, random.Random(task_seed(seed, size, i)))[0] for i in range(count)]
+    if pack.endswith(".jsonl"):
+        from engine.generate import load_puzzles
+        return [puzzle for puzzle, _, _ in load_puzzles(pack)][:count]
+    with Corpus(pack) as corpus:
+        return [corpus[k] for k in range(min(count, len(corpus)))]
+
+def parse_schedule(text):
+    start, _, end = text.partition(":")
+    return float(start), float(end or start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train a feature-based Q-learning agent")
+    parser.add_argument("--episodes", type=int, default=3000)
+    parser.add_argument("--model", metavar="PATH", help="load this .npz model if it exists and save it afterwards")
+    parser.add_argument("--kind", choices=list(MODELS), default="linear", help="model for a new run (default linear)")
+    parser.add_argument("--pack", default=DEFAULT_PACK, help=".tngo or .jsonl pack to train on (default: the bundled one)")
+    parser.add_argument("--size", type=int, default=None, help="train on freshly generated N x N puzzles instead of a pack")
+    parser.add_argument("--seed", default=None)
+    parser.add_argument("--puzzles", type=int, default=20, help="number of puzzles to train on")
+    parser.add_argument("--alpha", type=parse_schedule, default=(0.1, 0.01), metavar="START:END")
+    parser.add_argument("--epsilon", type=parse_schedule, default=(0.3, 0.02), metavar="START:END")
+    parser.add_argument("--halflife", type=float, default=750)
+    parser.add_argument("--gamma", type=float, default=0.9)
+    parser.add_argument("--batch", type=int, default=64, help="transitions per model update")
+    parser.add_argument("--report", type=int, default=100, help="print progress every N episodes")
+    args = parser.parse_args()
+
+    puzzles = training_puzzles(args.pack, args.puzzles, args.size, args.seed)
+    rng = random.Random(args.seed)
+    model = MODELS[args.kind]() if args.kind == "linear" else MLPQ(rng=np.random.default_rng(rng.getrandbits(64)))
+    if args.model:
+        try:
+            model = load_model(args.model)
+            print(f"Loaded {args.model} ({model.kind})")
+        except FileNotFoundError:
+            pass
+
+    def report(row):
+        print(f"episode {row['episode']:>7}  {row['episodes_per_s']:>6.0f} ep/s  solved {row['solve_rate']:6.1%}  "
+              f"{row['steps_per_episode']:5.1f} steps/ep  eps {row['epsilon']:.3f}  alpha {row['alpha']:.4f}", flush=True)
+
+    stats = train(model, puzzles, args.episodes, args.alpha, args.epsilon, args.halflife, args.gamma,
+                  args.batch, rng, report, args.report)
+    print(f"{stats['episodes']} episodes in {stats['time']:.2f}s ({stats['episodes'] / stats['time']:.0f}/s), "
+          f"{stats['solved']} solved")
+    greedy = sum(episode(model, p, p.initial_grid(), 0.0, rng)[0] for p in puzzles)
+    print(f"Greedy policy solves {greedy}/{len(puzzles)} training puzzles")
+    if args.model:
+        save_model(model, args.model)
+        print(f"Saved {args.model}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+# Q-learning agent that fills cells top-left to bottom-right
+#
+# Headless training: python -m engine.qlearn --episodes 20000 --qtable q.npz
+#     [--pack PATH --index K] [--alpha 0.5:0.05] [--epsilon 0.3:0.01]
+#     [--halflife 2000] [--gamma 0.9] [--seed S] [--report 1000]
+#     [--workers N --sync 1000] [--replay 10000 --prioritized --batch 32]
+# The Q-table is loaded from --qtable when it exists (warm start) and saved
+# back afterwards; tango.py -m qlearn --qtable q.npz replays it in a window.
+
+import argparse
+import math
+import multiprocessing as mp
+import numpy as np
+import os
+import random
+import time
+from array import array
+from engine.replay import ReplayBuffer, replay_update
+from game.constraints import _line_ok, bitboards, check_win, move_is_valid
+from game.pack import DEFAULT_PACK, encode, load_puzzle
+from engine.instrument import profiled
+
+class QTable:
+    # Q-values for one puzzle in flat arrays. The agent always fills the next
+    # open cell in row-major order and undoes invalid moves, so a state is the
+    # sequence of values placed so far and the states form a binary tree:
+    # state 0 is the start, q[2*s + a] is the value of action a (0 sun,
+    # 1 moon) in state s and child[2*s + a] the state it leads to (-1 if
+    # never reached). State ids are dense ints; nothing is hashed.
+    def __init__(self, puzzle):
+        self.puzzle = puzzle
+        self.open = [(r, c) for r in range(puzzle.size) for c in range(puzzle.size) if (r, c) not in puzzle.locked]
+        self.q = array('d', [0.0, 0.0])
+        self.child = array('q', [-1, -1])
+        self.episodes = 0
+
+    def __len__(self):
+        return len(self.q) // 2
+
+    def next_state(self, s, a):
+        t = self.child[2 * s + a]
+        if t < 0:
+            t = self.child[2 * s + a] = len(self.q) // 2
+            self.q.extend((0.0, 0.0))
+            self.child.extend((-1, -1))
+        return t
+
+    def state_of(self, grid):
+        # Walk the filled prefix of the open cells from the start state; -1
+        # for a board the table never reached. Never grows the table, and is
+        # only needed to pick up a board mid-way: episodes carry their id
+        # along with next_state().
+        s = 0
+        for r, c in self.open:
+            if not grid[r][c]:
+                break
+            s = self.child[2 * s + int(grid[r][c]) - 1]
+            if s < 0:
+                break
+        return s
+
+    def value(self, s, a):
+        return self.q[2 * s + a] if s >= 0 else 0.0
+
+    def merge(self, tables):
+        # Periodic averaging for parallel training: every table in `tables`
+        # started as a copy of this one. Their trees are matched by path, since
+        # ids differ once actors reach new states, and each q-value moves by
+        # the mean change of the actors that changed it.
+        delta = {}
+        for other in tables:
+            stack = [(0, 0)]
+            while stack:
+                s, m = stack.pop()
+                for a in (0, 1):
+                    i, j = 2 * s + a, 2 * m + a
+                    d = other.q[i] - self.q[j]
+                    if d:
+                        total, n = delta.get(j, (0.0, 0))
+                        delta[j] = (total + d, n + 1)
+                    if other.child[i] >= 0:
+                        stack.append((other.child[i], self.next_state(m, a)))
+        for j, (total, n) in delta.items():
+            self.q[j] += total / n
+
+    def save(self, path):
+        np.savez_compressed(path, q=np.frombuffer(self.q, dtype=np.float64),
+                            child=np.frombuffer(self.child, dtype=np.int64),
+                            puzzle=np.frombuffer(encode(self.puzzle).tobytes(), dtype=np.uint8),
+                            episodes=self.episodes)
+
+    @classmethod
+    def load(cls, path, puzzle):
+        table = cls(puzzle)
+        with np.load(path) as data:
+            if data["puzzle"].tobytes() != encode(puzzle).tobytes():
+                raise ValueError(f"{path} was trained on a different puzzle")
+            table.q = array('d', data["q"].astype(np.float64).tobytes())
+            table.child = array('q', data["child"].astype(np.int64).tobytes())
+            table.episodes = int(data["episodes"])
+        return table
+
+class TangoQLearningAgent:
+    # A state is (grid, locked cells, QTable id of the grid or -1); the id is
+    # carried along by the caller, so no lookup walks the board.
+    def __init__(self, alpha=0.5, gamma=0.9, epsilon=0.1, table=None, replay=None, batch_size=32,
+                 rng=None):
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.table = table  # QTable of the puzzle being played; play_agent creates one
+        self.replay = ReplayBuffer() if replay is None else replay  # transitions as state ids of self.table
+        self.batch_size = batch_size
+        # rng (a random.Random) picks the actions and seeds the minibatch
+        # sampler; by default it is drawn from the global state, so
+        # random.seed() also makes a run reproducible
+        self.rng = rng or random.Random(random.getrandbits(64))
+        self.nprng = np.random.default_rng(self.rng.getrandbits(64))
+
+    def getLegalActions(self, grid, locked_cells):
+        n = len(grid)
+        for i in range(n):
+            for j in range(n):
+                if (i, j) not in locked_cells and grid[i][j] == 0:
+                    return [(i, j, val) for val in [1, 2]]  # Only allow the next unfilled cell
+        return []  # All cells filled
+
+
+    def getQValue(self, state, action):
+        return self.table.value(state[2], action[2] - 1)
+
+    def computeActionFromQValues(self, state):
+        actions = self.getLegalActions(*state[:2])
+        if not actions: return None
+        qvals = [(a, self.getQValue(state, a)) for a in actions]
+        max_q = max(qvals, key=lambda x: x[1])[1]
+        best = [a for a, q in qvals if q == max_q]
+        return self.rng.choice(best)
+
+    @profiled
+    def getAction(self, state):
+        actions = self.getLegalActions(*state[:2])
+        if not actions: return None
+        return self.rng.choice(actions) if self.rng.random() < self.epsilon else self.computeActionFromQValues(state)
+
+    @profiled
+    def learn(self):
+        # One minibatch update from the replay buffer once it holds a batch;
+        # returns the number of transitions replayed.
+        if len(self.replay) < self.batch_size:
+            return 0
+        replay_update(self.table, self.replay, self.batch_size, self.alpha, self.gamma, self.nprng)
+        return self.batch_size
+
+@profiled
+def compute_reward(grid, i, j, puzzle=None):
+    # Only the move at (i, j) is new; invalid moves are always rolled back.
+    if not move_is_valid(grid, i, j, puzzle): return -5
+    if not np.any(grid == 0): return 100
+    return 1
+
+def play_agent(agent, puzzle, max_retries=30, on_step=None, verbose=False):
+    # Runs episodes until one solves the puzzle; on_step(grid, last_move) is
+    # called before every move. Every move goes into the agent's replay
+    # buffer and is followed by a minibatch update. Returns the final grid
+    # and run statistics.
+    if agent.table is None or agent.table.puzzle is not puzzle:
+        agent.table = QTable(puzzle)
+        agent.replay.clear()
+    stats = {"episodes": 0, "steps": 0, "updates": 0}
+    last_move = None
+    for attempt in range(max_retries):
+        grid = puzzle.initial_grid()
+        s = 0  # QTable id of the board
+        failed = set()  # values that broke a rule on this board
+        steps = 0
+        while not check_win(grid, puzzle) and steps < 100 and len(failed) < 2:
+            if on_step:
+                on_step(grid, last_move)
+            action = agent.getAction((grid, puzzle.locked, s))
+            if action is None: break
+            i, j, val = action
+            grid[i][j] = val
+            reward = compute_reward(grid, i, j, puzzle)
+            if reward < 0:
+                grid[i][j] = 0
+                agent.replay.add(s, val - 1, reward, -1)
+                failed.add(val)  # both failing is a dead end
+            else:
+                ns = agent.table.next_state(s, val - 1)
+                agent.replay.add(s, val - 1, reward, -1 if reward == 100 else ns)
+                s = ns
+                failed.clear()
+            last_move = ("Sun" if val == 1 else "Moon", (i, j))
+            stats["updates"] += agent.learn()
+            steps += 1
+        stats["episodes"] += 1
+        stats["steps"] += steps
+        if check_win(grid, puzzle):
+            if verbose:
+                print(f"Solved in {steps} steps on attempt {attempt + 1}")
+            return grid, stats
+        elif verbose:
+            print(f"Attempt {attempt + 1} failed. Retrying...")
+    return grid, stats
+
+def decay(start, end, halflife, t):
+    # Exponential schedule from start towards end, halving the gap every
+    # `halflife` episodes.
+    return end + (start - end) * 0.5 ** (t / halflife)
+
+@profiled
+def train(table, episodes, alpha=(0.5, 0.05), epsilon=(0.3, 0.01), halflife=2000, gamma=0.9,
+          max_steps=None, rng=None, report=None, report_every=1000, replay=None, batch_size=32):
+    # Fast headless Q-learning on table.puzzle with one-step online updates.
+    # Row/column bitboards are updated in place, so a move costs two line
+    # checks and a few array reads. With a ReplayBuffer every transition is
+    # also stored, and each batch_size of them adds a minibatch update.
+    # report(row) gets a progress dict every report_every episodes. Returns
+    # the overall stats.
+    p = table.puzzle
+    rng = rng or random.Random()
+    rand = rng.random
+    limit, eq_h, x_h, eq_v, x_v = p.limit, p.eq_h, p.x_h, p.eq_v, p.x_v
+    base = bitboards(p.initial_grid(), p)
+    cells = table.open
+    total = len(cells)
+    max_steps = max_steps or max(100, 3 * total)
+    q, child = table.q, table.child
+    if replay is not None:
+        add = replay.add
+        nprng = np.random.default_rng(rng.getrandbits(64))
+        pending = 0
+    stats = {"episodes": 0, "solved": 0, "steps": 0}
+    window_solved = window_steps = 0
+    # rates of the episode about to run; reported as is when there is none
+    eps = decay(epsilon[0], epsilon[1], halflife, table.episodes)
+    lr = decay(alpha[0], alpha[1], halflife, table.episodes)
+    start = window_start = time.perf_counter()
+    for _ in range(episodes):
+        t = table.episodes
+        eps = decay(epsilon[0], epsilon[1], halflife, t)
+        lr = decay(alpha[0], alpha[1], halflife, t)
+        row_s, row_m, col_s, col_m = (list(masks) for masks in base)
+        s = depth = steps = 0
+        failed = 0  # actions found invalid in the current state (bit a)
+        solved = False
+        while steps < max_steps:
+            steps += 1
+            r, c = cells[depth]
+            i = 2 * s
+            if rand() < eps:
+                a = 0 if rand() < 0.5 else 1
+            else:
+                qa, qb = q[i], q[i + 1]
+                a = 0 if qa > qb else 1 if qb > qa else (0 if rand() < 0.5 else 1)
+            rows, cols = (row_s, col_s) if a == 0 else (row_m, col_m)
+            rows[r] |= 1 << c
+            cols[c] |= 1 << r
+            if not (_line_ok(row_s[r], row_m[r], eq_h[r], x_h[r], limit)
+                    and _line_ok(col_s[c], col_m[c], eq_v[c], x_v[c], limit)):
+                rows[r] &= ~(1 << c)
+                cols[c] &= ~(1 << r)
+                q[i + a] += lr * (-5 - q[i + a])
+                if replay is not None:
+                    add(s, a, -5, -1)
+                    pending += 1
+                failed |= 1 << a
+                if failed == 3:
+                    break  # both values break a rule: dead end
+                continue
+            failed = 0
+            depth += 1
+            if depth == total:
+                q[i + a] += lr * (100 - q[i + a])
+                if replay is not None:
+                    add(s, a, 100, -1)
+                solved = True
+                break
+            nxt = child[i + a]
+            if nxt < 0:
+                nxt = table.next_state(s, a)
+            future = q[2 * nxt] if q[2 * nxt] > q[2 * nxt + 1] else q[2 * nxt + 1]
+            q[i + a] += lr * (1 + gamma * future - q[i + a])
+            if replay is not None:
+                add(s, a, 1, nxt)
+                pending += 1
+                if pending >= batch_size:
+                    replay_update(table, replay, batch_size, lr, gamma, nprng)
+                    pending = 0
+            s = nxt
+        table.episodes += 1
+        stats["episodes"] += 1
+        stats["steps"] += steps
+        stats["solved"] += solved
+        window_solved += solved
+        window_steps += steps
+        if report and table.episodes % report_every == 0:
+            now = time.perf_counter()
+            report({"episode": table.episodes, "episodes_per_s": report_every / (now - window_start),
+                    "solve_rate": window_solved / report_every, "steps_per_episode": window_steps / report_every,
+                    "states": len(table), "epsilon": eps, "alpha": lr})
+            window_solved = window_steps = 0
+            window_start = now
+    stats["time"] = time.perf_counter() - start
+    stats["states"] = len(table)
+    stats["epsilon"], stats["alpha"] = eps, lr
+    return stats
+
+def _actor(task):
+    # One actor's share of a round, run in a worker process on its own copy
+    # of the table.
+    puzzle, q, child, episodes, count, seed, options = task
+    table = QTable(puzzle)
+    table.q, table.child, table.episodes = q, child, episodes
+    stats = train(table, count, rng=random.Random(seed), **options)
+    return table.q, table.child, stats
+
+def train_parallel(table, episodes, workers=None, sync_every=1000, rng=None, report=None, **options):
+    # Q-learning over a pool of actor processes. In each round every actor
+    # trains sync_every episodes on a copy of the table; the learner then
+    # merges their changes into `table` and the next round starts from the
+    # merged policy. options are passed on to train(); report(row) is called
+    # after every round. Returns the overall stats.
+    workers = workers or os.cpu_count()
+    rng = rng or random.Random()
+    stats = {"episodes": 0, "solved": 0, "steps": 0}
+    start = time.perf_counter()
+    pool = mp.Pool(workers) if workers > 1 else None
+    try:
+        while stats["episodes"] < episodes:
+            round_start = time.perf_counter()
+            left = episodes - stats["episodes"]
+            counts = [min(sync_every, left - k * sync_every) for k in range(min(workers, -(-left // sync_every)))]
+            tasks = [(table.puzzle, table.q, table.child, table.episodes, n, rng.random(), options) for n in counts]
+            results = pool.map(_actor, tasks) if pool else list(map(_actor, tasks))
+            actors = []
+            for q, child, actor in results:
+                other = QTable(table.puzzle)
+                other.q, other.child = q, child
+                actors.append(other)
+                for key in ("episodes", "solved", "steps"):
+                    stats[key] += actor[key]
+            table.merge(actors)
+            table.episodes += sum(counts)
+            if report:
+                n = sum(counts)
+                report({"episode": table.episodes, "episodes_per_s": n / (time.perf_counter() - round_start),
+                        "solve_rate": sum(a["solved"] for _, _, a in results) / n,
+                        "steps_per_episode": sum(a["steps"] for _, _, a in results) / n,
+                        "states": len(table), "epsilon": results[-1][2]["epsilon"], "alpha": results[-1][2]["alpha"]})
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    stats["time"] = time.perf_counter() - start
+    stats["states"] = len(table)
+    return stats
+
+def greedy_path(table):
+    # Follow the learned policy without exploring; the finished grid, or None
+    # if the greedy policy breaks a rule or leaves the known states.
+    p = table.puzzle
+    grid = p.initial_grid()
+    s = 0
+    for r, c in table.open:
+        if s < 0:
+            return None
+        a = 0 if table.q[2 * s] >= table.q[2 * s + 1] else 1
+        grid[r][c] = a + 1
+        if not move_is_valid(grid, r, c, p):
+            return None
+        s = table.child[2 * s + a]
+    return grid if check_win(grid, p) else None
+
+def solve(grid, puzzle, max_retries=30, agent=None, qtable=None, seed=None):
+    # Episodes always restart from the puzzle's givens, so grid is not used.
+    # qtable: a QTable, or the path of one saved by the trainer, to start from.
+    # seed fixes the new agent's choices; a given agent keeps its own rng.
+    if isinstance(qtable, str):
+        qtable = QTable.load(qtable, puzzle)
+    if agent is None:
+        agent = TangoQLearningAgent(table=qtable, rng=None if seed is None else random.Random(seed))
+    final, stats = play_agent(agent, puzzle, max_retries)
+    return (final if check_win(final, puzzle) else None), stats
+
+def parse_schedule(text):
+    start, _, end = text.partition(":")
+    return float(start), float(end or start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the Q-learning agent without a window")
+    parser.add_argument("--episodes", type=int, default=20000)
+    parser.add_argument("--qtable", metavar="PATH", help="load this .npz Q-table if it exists and save it afterwards")
+    parser.add_argument("--pack", default=DEFAULT_PACK, help=".tngo pack holding the puzzle (default: the bundled one)")
+    parser.add_argument("--index", type=int, default=0, help="puzzle of the pack to train on")
+    parser.add_argument("--alpha", type=parse_schedule, default=(0.5, 0.05), metavar="START:END")
+    parser.add_argument("--epsilon", type=parse_schedule, default=(0.3, 0.01), metavar="START:END")
+    parser.add_argument("--halflife", type=float, default=2000, help="episodes for alpha/epsilon to close half the gap")
+    parser.add_argument("--gamma", type=float, default=0.9)
+    parser.add_argument("--seed", default=None)
+    parser.add_argument("--report", type=int, default=1000, help="print progress every N episodes")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="actor processes; above 1 the actors' tables are merged every --sync episodes")
+    parser.add_argument("--sync", type=int, default=1000, help="episodes each actor runs between merges")
+    parser.add_argument("--replay", type=int, default=0, metavar="CAPACITY",
+                        help="also learn from minibatches of a replay buffer of this many transitions")
+    parser.add_argument("--prioritized", action="store_true", help="sample the replay buffer by TD error")
+    parser.add_argument("--batch", type=int, default=32, help="replay minibatch size")
+    args = parser.parse_args()
+    if args.episodes < 0:
+        parser.error("--episodes must be 0 or more")
+
+    puzzle = load_puzzle(args.pack, args.index)
+    table = QTable(puzzle)
+    if args.qtable:
+        try:
+            table = QTable.load(args.qtable, puzzle)
+            print(f"Loaded {args.qtable}: {len(table)} states after {table.episodes} episodes")
+        except FileNotFoundError:
+            pass
+
+    def report(row):
+        print(f"episode {row['episode']:>8}  {row['episodes_per_s']:>8.0f} ep/s  solved {row['solve_rate']:6.1%}  "
+              f"{row['steps_per_episode']:5.1f} steps/ep  {row['states']:>8} states  "
+              f"eps {row['epsilon']:.3f}  alpha {row['alpha']:.3f}", flush=True)
+
+    options = {"alpha": args.alpha, "epsilon": args.epsilon, "halflife": args.halflife, "gamma": args.gamma}
+    if args.replay:
+        options["replay"] = ReplayBuffer(args.replay, args.prioritized)
+        options["batch_size"] = args.batch
+    if args.workers > 1:
+        stats = train_parallel(table, args.episodes, args.workers, args.sync, random.Random(args.seed), report, **options)
+    else:
+        stats = train(table, args.episodes, rng=random.Random(args.seed), report=report, report_every=args.report, **options)
+    rate = stats["episodes"] / stats["time"] if stats["time"] else math.inf
+    print(f"{stats['episodes']} episodes in {stats['time']:.2f}s ({rate:.0f}/s), "
+          f"{stats['solved']} solved, {stats['states']} states")
+    print("Greedy policy " + ("solves the puzzle" if greedy_path(table) is not None else "does not solve the puzzle yet"))
+    if args.qtable:
+        table.save(args.qtable)
+        print(f"Saved {args.qtable}")
+
+if __name__ == "__main__":
+    main()
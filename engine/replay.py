@@ -0,0 +1,71 @@
+# Experience replay for the tabular Q-learning agent: transitions are kept
+# as packed QTable state ids in preallocated numpy ring arrays, so adding
+# one allocates nothing, and minibatches are sampled uniformly or by
+# TD-error priority and applied to the Q-table in one vectorized update.
+
+import numpy as np
+
+class ReplayBuffer:
+    def __init__(self, capacity=10000, prioritized=False, alpha=0.6, beta=0.4, eps=1e-3):
+        # alpha: how strongly priorities skew sampling (0 is uniform); beta:
+        # strength of the importance-sampling correction.
+        self.capacity = capacity
+        self.prioritized = prioritized
+        self.alpha, self.beta, self.eps = alpha, beta, eps
+        self.state = np.zeros(capacity, dtype=np.int64)
+        self.action = np.zeros(capacity, dtype=np.int8)
+        self.reward = np.zeros(capacity, dtype=np.float32)
+        self.next_state = np.zeros(capacity, dtype=np.int64)  # -1 when terminal
+        self.priority = np.zeros(capacity)
+        self.max_priority = 1.0
+        self.pos = self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        self.pos = self.size = 0
+        self.max_priority = 1.0
+
+    def add(self, state, action, reward, next_state):
+        i = self.pos
+        self.state[i] = state
+        self.action[i] = action
+        self.reward[i] = reward
+        self.next_state[i] = next_state
+        self.priority[i] = self.max_priority  # new transitions are replayed at least once soon
+        self.pos = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, n, rng):
+        # (indices, importance weights) of a minibatch. Priority sampling is a
+        # vectorized pass over the filled part, cheaper in numpy than a sum
+        # tree walked from Python at these sizes.
+        if not self.prioritized:
+            return rng.integers(0, self.size, n), np.ones(n)
+        p = self.priority[:self.size] ** self.alpha
+        p /= p.sum()
+        idx = rng.choice(self.size, n, p=p)
+        weights = (self.size * p[idx]) ** -self.beta
+        return idx, weights / weights.max()
+
+    def update_priorities(self, idx, td):
+        if self.prioritized:
+            self.priority[idx] = np.abs(td) + self.eps
+            self.max_priority = max(self.max_priority, float(self.priority[idx].max()))
+
+def replay_update(table, buffer, batch, alpha, gamma, rng):
+    # One minibatch Q-learning step on a QTable; returns the TD errors.
+    idx, weights = buffer.sample(batch, rng)
+    q = np.frombuffer(table.q)  # view; released before the table grows again
+    s, a, r, ns = buffer.state[idx], buffer.action[idx], buffer.reward[idx], buffer.next_state[idx]
+    i = 2 * s + a
+    live = ns >= 0
+    future = np.zeros(len(idx))
+    future[live] = np.maximum(q[2 * ns[live]], q[2 * ns[live] + 1])
+    td = r + gamma * future - q[i]
+    # a transition drawn more than once moves its value by the mean, not the sum
+    cells, inverse = np.unique(i, return_inverse=True)
+    q[cells] += np.bincount(inverse, alpha * weights * td) / np.bincount(inverse)
+    buffer.update_priorities(idx, td)
+    return td
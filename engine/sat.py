@@ -0,0 +1,321 @@
+# CNF encoding of a puzzle and a small CDCL SAT solver (two watched literals,
+# first-UIP clause learning, VSIDS-style activities, phase saving and Luby
+# restarts). Variable r*N + c + 1 is true when cell (r, c) holds a sun.
+
+import heapq
+from engine.instrument import profiled
+
+STOP_POLL = 256  # search iterations between should_stop() polls
+
+def cell_var(r, c, size):
+    return r * size + c + 1
+
+def _at_most(lits, k, next_var, clauses):
+    # Sequential counter (Sinz 2005): s[i][j] means "at least j+1 of the first
+    # i+1 literals are true". Returns the next free variable.
+    n = len(lits)
+    if k >= n:
+        return next_var
+    if k == 0:
+        clauses.extend([-x] for x in lits)
+        return next_var
+    s = [[next_var + i * k + j for j in range(k)] for i in range(n - 1)]
+    next_var += (n - 1) * k
+    clauses.append([-lits[0], s[0][0]])
+    for j in range(1, k):
+        clauses.append([-s[0][j]])
+    for i in range(1, n - 1):
+        clauses.append([-lits[i], s[i][0]])
+        clauses.append([-s[i - 1][0], s[i][0]])
+        for j in range(1, k):
+            clauses.append([-lits[i], -s[i - 1][j - 1], s[i][j]])
+            clauses.append([-s[i - 1][j], s[i][j]])
+        clauses.append([-lits[i], -s[i - 1][k - 1]])
+    clauses.append([-lits[n - 1], -s[n - 2][k - 1]])
+    return next_var
+
+@profiled
+def encode(grid, puzzle):
+    # Returns (num_vars, clauses) for the givens and current fill of grid,
+    # the triple rule, the per-line cardinality rule and the '=' / 'x' edges.
+    n = puzzle.size
+    clauses = []
+    for r in range(n):
+        for c in range(n):
+            if grid[r][c]:
+                clauses.append([cell_var(r, c, n) if grid[r][c] == 1 else -cell_var(r, c, n)])
+    for (r, c), val in puzzle.locked.items():
+        clauses.append([cell_var(r, c, n) if val == 1 else -cell_var(r, c, n)])
+    lines = [[cell_var(i, j, n) for j in range(n)] for i in range(n)]
+    lines += [[cell_var(i, j, n) for i in range(n)] for j in range(n)]
+    next_var = n * n + 1
+    for line in lines:
+        for k in range(n - 2):
+            a, b, c = line[k:k + 3]
+            clauses.append([a, b, c])
+            clauses.append([-a, -b, -c])
+        next_var = _at_most(line, puzzle.limit, next_var, clauses)
+        next_var = _at_most([-x for x in line], puzzle.limit, next_var, clauses)
+    for (r, c), (symbol, direction) in puzzle.constraints.items():
+        a = cell_var(r, c, n)
+        b = cell_var(r, c + 1, n) if direction == 'H' else cell_var(r + 1, c, n)
+        if symbol == '=':
+            clauses += [[a, -b], [-a, b]]
+        else:
+            clauses += [[a, b], [-a, -b]]
+    return next_var - 1, clauses
+
+def write_dimacs(out, num_vars, clauses):
+    out.write(f"p cnf {num_vars} {len(clauses)}\n")
+    for clause in clauses:
+        out.write(" ".join(map(str, clause)) + " 0\n")
+
+def read_dimacs(lines):
+    num_vars, clauses, current = 0, [], []
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] in "c%":
+            continue
+        if line[0] == "p":
+            num_vars = int(line.split()[2])
+            continue
+        for tok in line.split():
+            lit = int(tok)
+            if lit == 0:
+                clauses.append(current)
+                current = []
+            else:
+                current.append(lit)
+    return num_vars, clauses
+
+def luby(i):
+    # i-th term (1-based) of the Luby restart sequence 1 1 2 1 1 2 4 ...
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while (1 << k) - 1 != i:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+class CDCLSolver:
+    def __init__(self, num_vars, clauses, restart_base=100):
+        self.num_vars = num_vars
+        self.clauses = []
+        self.watches = {}
+        self.value = [0] * (num_vars + 1)  # 1 true, -1 false, 0 unassigned
+        self.level = [0] * (num_vars + 1)
+        self.reason = [None] * (num_vars + 1)
+        self.phase = [False] * (num_vars + 1)
+        self.activity = [0.0] * (num_vars + 1)
+        self.bump = 1.0
+        self.heap = [(0.0, v) for v in range(1, num_vars + 1)]
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.restart_base = restart_base
+        self.ok = True
+        self.stats = {"conflicts": 0, "propagations": 0, "decisions": 0, "restarts": 0, "learned": 0}
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def lit_value(self, lit):
+        v = self.value[abs(lit)]
+        return v if lit > 0 else -v
+
+    def add_clause(self, lits):
+        lits = list(dict.fromkeys(lits))
+        if any(-l in lits for l in lits) or not self.ok:
+            return  # tautology, or already unsatisfiable
+        lits = [l for l in lits if self.lit_value(l) != -1 or self.level[abs(l)] > 0]
+        if any(self.lit_value(l) == 1 and self.level[abs(l)] == 0 for l in lits):
+            return
+        if not lits:
+            self.ok = False
+        elif len(lits) == 1:
+            self.enqueue(lits[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self._attach(lits)
+
+    def _attach(self, lits):
+        index = len(self.clauses)
+        self.clauses.append(lits)
+        self.watches.setdefault(lits[0], []).append(index)
+        self.watches.setdefault(lits[1], []).append(index)
+        return index
+
+    def enqueue(self, lit, reason):
+        v = abs(lit)
+        self.value[v] = 1 if lit > 0 else -1
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    @profiled
+    def propagate(self):
+        # Returns the index of a conflicting clause, or None.
+        clauses, watches = self.clauses, self.watches
+        while self.qhead < len(self.trail):
+            false_lit = -self.trail[self.qhead]
+            self.qhead += 1
+            self.stats["propagations"] += 1
+            watching = watches.get(false_lit)
+            if not watching:
+                continue
+            keep = []
+            i = 0
+            while i < len(watching):
+                ci = watching[i]
+                i += 1
+                c = clauses[ci]
+                if c[0] == false_lit:
+                    c[0], c[1] = c[1], c[0]
+                if self.lit_value(c[0]) == 1:
+                    keep.append(ci)
+                    continue
+                for k in range(2, len(c)):
+                    if self.lit_value(c[k]) != -1:
+                        c[1], c[k] = c[k], c[1]
+                        watches.setdefault(c[1], []).append(ci)
+                        break
+                else:
+                    keep.append(ci)
+                    if self.lit_value(c[0]) == -1:
+                        keep.extend(watching[i:])
+                        watches[false_lit] = keep
+                        self.qhead = len(self.trail)
+                        return ci
+                    self.enqueue(c[0], ci)
+            watches[false_lit] = keep
+        return None
+
+    def _bump(self, v):
+        self.activity[v] += self.bump
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.bump *= 1e-100
+            self.heap = [(-self.activity[u], u) for u in range(1, self.num_vars + 1) if not self.value[u]]
+            heapq.heapify(self.heap)
+        heapq.heappush(self.heap, (-self.activity[v], v))
+
+    @profiled
+    def analyze(self, conflict):
+        # First-UIP learning: returns the learned clause (asserting literal
+        # first) and the level to jump back to.
+        current = len(self.trail_lim)
+        seen = set()
+        learnt = [None]
+        counter = 0
+        p = None
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            for q in clause:
+                if q == p:
+                    continue
+                v = abs(q)
+                if v not in seen and self.level[v] > 0:
+                    seen.add(v)
+                    self._bump(v)
+                    if self.level[v] == current:
+                        counter += 1
+                    else:
+                        learnt.append(q)
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            p = self.trail[index]
+            index -= 1
+            seen.discard(abs(p))
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self.clauses[self.reason[abs(p)]]
+        learnt[0] = -p
+        if len(learnt) == 1:
+            return learnt, 0
+        best = max(range(1, len(learnt)), key=lambda k: self.level[abs(learnt[k])])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def cancel_until(self, level):
+        if len(self.trail_lim) <= level:
+            return
+        stop = self.trail_lim[level]
+        for lit in self.trail[stop:]:
+            v = abs(lit)
+            self.phase[v] = lit > 0
+            self.value[v] = 0
+            self.reason[v] = None
+            heapq.heappush(self.heap, (-self.activity[v], v))
+        del self.trail[stop:]
+        del self.trail_lim[level:]
+        self.qhead = len(self.trail)
+
+    def pick(self):
+        while self.heap:
+            _, v = heapq.heappop(self.heap)
+            if not self.value[v]:
+                return v
+        return None
+
+    @profiled
+    def solve(self, should_stop=None):
+        # Returns a model (list of values indexed by variable) or None if UNSAT.
+        # should_stop() is polled every STOP_POLL iterations; when it returns
+        # True the search gives up with None and stats["stopped"] set.
+        if not self.ok or self.propagate() is not None:
+            return None
+        restarts = 1
+        budget = self.restart_base * luby(restarts)
+        since_restart = 0
+        steps = 0
+        while True:
+            steps += 1
+            if should_stop and not steps % STOP_POLL and should_stop():
+                self.stats["stopped"] = True
+                return None
+            conflict = self.propagate()
+            if conflict is not None:
+                self.stats["conflicts"] += 1
+                since_restart += 1
+                if not self.trail_lim:
+                    return None
+                learnt, back = self.analyze(conflict)
+                self.cancel_until(back)
+                if len(learnt) == 1:
+                    self.enqueue(learnt[0], None)
+                else:
+                    self.enqueue(learnt[0], self._attach(learnt))
+                self.stats["learned"] += 1
+                self.bump /= 0.95
+            elif since_restart >= budget:
+                self.stats["restarts"] += 1
+                restarts += 1
+                budget = self.restart_base * luby(restarts)
+                since_restart = 0
+                self.cancel_until(0)
+            else:
+                v = self.pick()
+                if v is None:
+                    return self.value[:]
+                self.stats["decisions"] += 1
+                self.trail_lim.append(len(self.trail))
+                self.enqueue(v if self.phase[v] else -v, None)
+
+def solve(grid, puzzle, should_stop=None):
+    # Fills grid in place from the SAT model; returns it, or None if UNSAT
+    # (or stopped early by should_stop).
+    n = puzzle.size
+    num_vars, clauses = encode(grid, puzzle)
+    solver = CDCLSolver(num_vars, clauses)
+    model = solver.solve(should_stop)
+    stats = dict(solver.stats, variables=num_vars, clauses=len(clauses))
+    if model is None:
+        return None, stats
+    for r in range(n):
+        for c in range(n):
+            grid[r][c] = 1 if model[cell_var(r, c, n)] > 0 else 2
+    return grid, stats
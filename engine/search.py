@@ -0,0 +1,96 @@
+# Depth-first search over a DomainStore: most-constrained cell first (MRV with
+# dom/wdeg ties), least-constraining value first (LCV), forward checking or
+# maintained arc consistency after every assignment, and domains restored
+# from the trail on backtrack. With a transposition table (and a
+# HashedDomainStore) positions found to have no solution are remembered, so
+# their symmetric images are cut off at once.
+
+from engine.propagate import BOTH, SUN, MOON
+from game.constraints import IncrementalChecker
+from engine.instrument import profiled
+
+@profiled
+def select_cell(store, order="mrv"):
+    # Every open cell has two values, so plain MRV is all ties. They are broken
+    # by dom/wdeg: the cell whose still-open propagators have caused the most
+    # wipe-outs so far, which steers search toward the hard part of the board.
+    n = store.size
+    d = store.domains
+    if order == "static":
+        for cell in range(n * n):
+            if d[cell] == BOTH:
+                return cell
+        return None
+    props, weights = store.props, store.weights
+    best, best_score = None, -1
+    for cell in range(n * n):
+        if d[cell] != BOTH:
+            continue
+        score = 0
+        for index in store.watch[cell]:
+            for other in props[index][1]:
+                if other != cell and d[other] == BOTH:
+                    score += weights[index]
+                    break
+        if score > best_score:
+            best, best_score = cell, score
+    return best
+
+def infer(store, cell, inference, stats):
+    if inference == "mac":
+        return store.propagate([cell], stats)
+    return store.forward_check(cell, stats)
+
+@profiled
+def order_values(store, cell, order="mrv"):
+    if order == "static":
+        return [SUN, MOON]
+    # LCV, estimated cheaply: a single forward-checking pass per value (no
+    # cascade, not counted in stats) drops values that wipe a neighbour out
+    # and ranks the rest by how many cells they narrow. Only the value that
+    # is then tried gets the full inference.
+    scored = []
+    for val in (SUN, MOON):
+        mark = store.mark()
+        store.set(cell, val)
+        if store.forward_check(cell):
+            scored.append((store.mark() - mark, val))
+        store.undo(mark)
+    scored.sort()
+    return [val for _, val in scored]
+
+@profiled
+def search(store, stats, inference="mac", order="mrv", on_step=None, tt=None):
+    cell = select_cell(store, order)
+    if cell is None:
+        # forward checking never looks past a cell's own constraints, so a
+        # full assignment still has to be checked against every rule
+        if inference == "mac":
+            return True
+        # Cells go into an IncrementalChecker one by one, so an invalid board
+        # is rejected at its first violation.
+        checker = IncrementalChecker(puzzle=store.puzzle)
+        n = store.size
+        for cell, val in enumerate(store.domains):
+            if not checker.assign(cell // n, cell % n, val):
+                return False
+        return True
+    if tt is not None:
+        key = store.key()
+        if key in tt:
+            return False  # only dead positions are stored
+    for val in order_values(store, cell, order):
+        stats["nodes"] += 1
+        mark = store.mark()
+        store.set(cell, val)
+        if on_step:
+            on_step(cell)
+        if infer(store, cell, inference, stats) and search(store, stats, inference, order, on_step, tt):
+            return True
+        store.undo(mark)
+        stats["backtracks"] += 1
+        if on_step:
+            on_step(cell)
+    if tt is not None:
+        tt[key] = False
+    return False
@@ -0,0 +1,159 @@
+# Zobrist hashing of boards and domain stores, optionally canonical under
+# the puzzle's symmetry group, and a size-bounded transposition table.
+#
+# A key is the XOR of one random 64-bit number per (cell, value), so an
+# assignment updates it with two XORs instead of rehashing the board. With
+# canonical=True one hash is kept per symmetry of the puzzle (the rotations,
+# reflections and sun/moon swap that map its givens and edges onto
+# themselves) and the key is their minimum: boards that are images of each
+# other under the puzzle's symmetry share a key.
+
+import random
+from functools import lru_cache
+from game.pack import encode
+
+# The 8 symmetries of the square as (flip rows, flip columns, transpose),
+# applied in that order.
+TRANSFORMS = [(fr, fc, t) for t in (False, True) for fr in (False, True) for fc in (False, True)]
+
+def image(transform, r, c, n):
+    fr, fc, t = transform
+    if fr:
+        r = n - 1 - r
+    if fc:
+        c = n - 1 - c
+    return (c, r) if t else (r, c)
+
+def _edges(puzzle):
+    edges = {}
+    for (r, c), (symbol, direction) in puzzle.constraints.items():
+        other = (r, c + 1) if direction == 'H' else (r + 1, c)
+        edges[frozenset(((r, c), other))] = symbol
+    return edges
+
+def symmetries(puzzle):
+    # (transform, colour swap) for every symmetry that maps the givens and
+    # edges onto themselves; the identity comes first.
+    n = puzzle.size
+    edges = _edges(puzzle)
+    group = []
+    for transform in TRANSFORMS:
+        moved = {frozenset(image(transform, r, c, n) for r, c in edge): symbol for edge, symbol in edges.items()}
+        if moved != edges:
+            continue
+        for swap in (False, True):
+            if all(puzzle.locked.get(image(transform, r, c, n)) == (3 - val if swap else val)
+                   for (r, c), val in puzzle.locked.items()):
+                group.append((transform, swap))
+    return group
+
+@lru_cache(maxsize=None)
+def _reversed_masks(n):
+    return [int(format(mask, f"0{n}b")[::-1], 2) for mask in range(1 << n)]
+
+def canonical_lines(lines, group, n):
+    # Key of a set of lines given as (is_row, i, suns, moons), shared by all
+    # its images under the group: the smallest sorted image.
+    rev = _reversed_masks(n)
+    best = None
+    for (fr, fc, t), swap in group:
+        moved = []
+        for is_row, i, s, m in lines:
+            if is_row:
+                flip_index, flip_bits = fr, fc
+            else:
+                flip_index, flip_bits = fc, fr
+            if flip_index:
+                i = n - 1 - i
+            if flip_bits:
+                s, m = rev[s], rev[m]
+            moved.append((is_row != t, i, m, s) if swap else (is_row != t, i, s, m))
+        moved.sort()
+        moved = tuple(moved)
+        if best is None or moved < best:
+            best = moved
+    return best
+
+class Zobrist:
+    # Values are 0 (empty, hashes to nothing), SUN 1, MOON 2 and, for domain
+    # stores, BOTH 3. The random numbers are seeded from the puzzle itself,
+    # so keys of different puzzles do not mix in a shared table.
+    def __init__(self, puzzle, canonical=False):
+        cells = puzzle.size * puzzle.size
+        rng = random.Random(encode(puzzle).tobytes())
+        self.salt = rng.getrandbits(64)
+        base = [rng.getrandbits(64) for _ in range(4 * cells)]
+        n = puzzle.size
+        group = symmetries(puzzle) if canonical else [(TRANSFORMS[0], False)]
+        self.tables = []
+        for transform, swap in group:
+            table = [0] * (4 * cells)
+            for cell in range(cells):
+                r, c = image(transform, *divmod(cell, n), n)
+                for val in (1, 2, 3):
+                    table[4 * cell + val] = base[4 * (r * n + c) + (3 - val if swap and val < 3 else val)]
+            self.tables.append(table)
+
+    def hashes(self, values):
+        # One hash per symmetry of a flat sequence of cell values.
+        result = []
+        for table in self.tables:
+            h = 0
+            for cell, val in enumerate(values):
+                h ^= table[4 * cell + val]
+            result.append(h)
+        return tuple(result)
+
+    def update(self, hashes, cell, old, new):
+        i, j = 4 * cell + old, 4 * cell + new
+        if len(hashes) == 1:
+            table = self.tables[0]
+            return (hashes[0] ^ table[i] ^ table[j],)
+        return tuple(h ^ table[i] ^ table[j] for h, table in zip(hashes, self.tables))
+
+    @staticmethod
+    def key(hashes):
+        return min(hashes)
+
+class TranspositionTable:
+    # 2**bits slots indexed by the low bits of the key's hash. A new entry
+    # always replaces whatever its slot held, so memory stays fixed and the
+    # most recent positions win. Keys are kept whole and compared on lookup;
+    # only a Zobrist collision (two positions, one 64-bit key) can mislead.
+    def __init__(self, bits=18):
+        self.mask = (1 << bits) - 1
+        self.keys = [None] * (1 << bits)
+        self.values = [None] * (1 << bits)
+        self.hits = self.misses = self.stores = self.evictions = 0
+
+    def get(self, key, default=None):
+        slot = hash(key) & self.mask
+        if self.keys[slot] == key:
+            self.hits += 1
+            return self.values[slot]
+        self.misses += 1
+        return default
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __getitem__(self, key):
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        slot = hash(key) & self.mask
+        if self.keys[slot] is not None and self.keys[slot] != key:
+            self.evictions += 1
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.stores += 1
+
+    def __len__(self):
+        return sum(key is not None for key in self.keys)
+
+    def report(self):
+        return {"tt_hits": self.hits, "tt_misses": self.misses, "tt_stores": self.stores,
+                "tt_evictions": self.evictions}
@@ -1,65 +1,238 @@
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from game.pack import load_puzzle
+from engine.instrument import profiled
 
-GRID_SIZE = 6
+# Rules used when a check is called without an explicit puzzle: the classic
+# 6x6 puzzle, first in the bundled pack
+RULES = load_puzzle()
 
-# Fixed locked values for initial state
-locked_cells = {(0, 1): 1, (2, 2): 2, (4, 5): 1, (5, 0): 2}
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(x):
+        return bin(x).count("1")
 
-# Constraint symbols and directions
-constraints = {
-    (0, 0): ('=', 'H'),
-    (1, 2): ('x', 'V'),
-    (3, 3): ('=', 'V'),
-    (4, 1): ('x', 'H'),
-    (2, 5): ('=', 'H')
-}
+# Bitboards: every row and column is stored as a sun mask and a moon mask,
+# bit j of a row mask is column j and bit i of a column mask is row i.
+def bitboards(grid, puzzle=None):
+    weights = (puzzle or RULES).weights
+    suns = grid == 1
+    moons = grid == 2
+    return ((suns @ weights).tolist(), (moons @ weights).tolist(),
+            (weights @ suns).tolist(), (weights @ moons).tolist())
 
-constraints = {
-    k: v for k, v in constraints.items()
-    if not (v[1] == 'H' and k[1] == GRID_SIZE - 1 or v[1] == 'V' and k[0] == GRID_SIZE - 1)
-}
+def _triple_bits(s, m):
+    t = (s & (s >> 1) & (s >> 2)) | (m & (m >> 1) & (m >> 2))
+    return t | (t << 1) | (t << 2)
 
-def check_triples(grid):
+def _edge_bits(s, m, eq, x):
+    bad = (((s & (m >> 1)) | (m & (s >> 1))) & eq) | (((s & (s >> 1)) | (m & (m >> 1))) & x)
+    return bad | (bad << 1)
+
+def _line_ok(s, m, eq, x, limit):
+    if popcount(s) > limit or popcount(m) > limit:
+        return False
+    if s & (s >> 1) & (s >> 2) or m & (m >> 1) & (m >> 2):
+        return False
+    return not ((((s & (m >> 1)) | (m & (s >> 1))) & eq) | (((s & (s >> 1)) | (m & (m >> 1))) & x))
+
+def _cells(bits, i, horizontal):
+    cells = set()
+    while bits:
+        low = bits & -bits
+        j = low.bit_length() - 1
+        cells.add((i, j) if horizontal else (j, i))
+        bits ^= low
+    return cells
+
+def _valid(bb, p):
+    row_s, row_m, col_s, col_m = bb
+    limit = p.limit
+    for i in range(p.size):
+        if not _line_ok(row_s[i], row_m[i], p.eq_h[i], p.x_h[i], limit):
+            return False
+        if not _line_ok(col_s[i], col_m[i], p.eq_v[i], p.x_v[i], limit):
+            return False
+    return True
+
+def _triple_errors(bb, p):
+    row_s, row_m, col_s, col_m = bb
     errors = set()
-    for i in range(GRID_SIZE):
-        for j in range(GRID_SIZE - 2):
-            row = grid[i, j:j+3]
-            if row[0] == row[1] == row[2] != 0:
-                errors.update({(i, j), (i, j+1), (i, j+2)})
-            col = grid[j:j+3, i]
-            if col[0] == col[1] == col[2] != 0:
-                errors.update({(j, i), (j+1, i), (j+2, i)})
+    for i in range(p.size):
+        errors |= _cells(_triple_bits(row_s[i], row_m[i]), i, True)
+        errors |= _cells(_triple_bits(col_s[i], col_m[i]), i, False)
     return errors
 
-def check_equal_counts(grid):
+def _count_errors(bb, p):
+    row_s, row_m, col_s, col_m = bb
+    n, limit = p.size, p.limit
     errors = set()
-    for i in range(GRID_SIZE):
-        row = grid[i]
-        col = grid[:, i]
-        if list(row).count(1) > 3 or list(row).count(2) > 3:
-            errors.update({(i, j) for j in range(GRID_SIZE)})
-        if list(col).count(1) > 3 or list(col).count(2) > 3:
-            errors.update({(j, i) for j in range(GRID_SIZE)})
+    for i in range(n):
+        if popcount(row_s[i]) > limit or popcount(row_m[i]) > limit:
+            errors.update({(i, j) for j in range(n)})
+        if popcount(col_s[i]) > limit or popcount(col_m[i]) > limit:
+            errors.update({(j, i) for j in range(n)})
     return errors
 
-def check_constraints(grid):
+def _edge_errors(bb, p):
+    row_s, row_m, col_s, col_m = bb
     errors = set()
-    for (r, c), (symbol, direction) in constraints.items():
-        if direction == 'H' and c < GRID_SIZE - 1:
-            val1 = grid[r][c]
-            val2 = grid[r][c+1]
-        elif direction == 'V' and r < GRID_SIZE - 1:
-            val1 = grid[r][c]
-            val2 = grid[r+1][c]
-        else:
-            continue
-        if symbol == '=' and val1 != 0 and val2 != 0 and val1 != val2:
-            errors.update({(r, c), (r, c+1) if direction == 'H' else (r+1, c)})
-        elif symbol == 'x' and val1 != 0 and val2 != 0 and val1 == val2:
-            errors.update({(r, c), (r, c+1) if direction == 'H' else (r+1, c)})
+    for i in range(p.size):
+        errors |= _cells(_edge_bits(row_s[i], row_m[i], p.eq_h[i], p.x_h[i]), i, True)
+        errors |= _cells(_edge_bits(col_s[i], col_m[i], p.eq_v[i], p.x_v[i]), i, False)
     return errors
 
-def check_win(grid):
-    return not np.any(grid == 0) and not (
-        check_triples(grid) or check_equal_counts(grid) or check_constraints(grid)
-    )
+@profiled
+def is_valid(grid, puzzle=None):
+    p = puzzle or RULES
+    return _valid(bitboards(grid, p), p)
+
+@profiled
+def check_triples(grid, puzzle=None):
+    p = puzzle or RULES
+    return _triple_errors(bitboards(grid, p), p)
+
+@profiled
+def check_equal_counts(grid, puzzle=None):
+    p = puzzle or RULES
+    return _count_errors(bitboards(grid, p), p)
+
+@profiled
+def check_constraints(grid, puzzle=None):
+    p = puzzle or RULES
+    return _edge_errors(bitboards(grid, p), p)
+
+@profiled
+def error_cells(grid, puzzle=None):
+    # Union of all three checks; the sets are only built when something is wrong.
+    p = puzzle or RULES
+    bb = bitboards(grid, p)
+    if _valid(bb, p):
+        return set()
+    return _triple_errors(bb, p) | _count_errors(bb, p) | _edge_errors(bb, p)
+
+@profiled
+def check_win(grid, puzzle=None):
+    return not np.any(grid == 0) and is_valid(grid, puzzle)
+
+def _local_violations(grid, r, c, v, row_count, col_count, p):
+    # Violations that involve (r, c) holding v: monochrome windows through the
+    # cell, row/column overflow for v and broken incident edges.
+    found = 0
+    row = grid[r]
+    for j in range(max(0, c - 2), min(c, p.size - 3) + 1):
+        if row[j] == row[j + 1] == row[j + 2] == v:
+            found += 1
+    for i in range(max(0, r - 2), min(r, p.size - 3) + 1):
+        if grid[i][c] == grid[i + 1][c] == grid[i + 2][c] == v:
+            found += 1
+    if row_count > p.limit:
+        found += 1
+    if col_count > p.limit:
+        found += 1
+    for (i, j), symbol in p.incident.get((r, c), ()):
+        other = grid[i][j]
+        if other and (other != v if symbol == '=' else other == v):
+            found += 1
+    return found
+
+@profiled
+def move_is_valid(grid, r, c, puzzle=None):
+    # Check a grid that was valid before (r, c) was written, looking only at
+    # the affected row, column and edges.
+    v = grid[r][c]
+    if not v:
+        return True
+    row_count = int(np.count_nonzero(grid[r] == v))
+    col_count = int(np.count_nonzero(grid[:, c] == v))
+    return _local_violations(grid, r, c, v, row_count, col_count, puzzle or RULES) == 0
+
+class IncrementalChecker:
+    # Running row/column counts and a violation total, updated in O(1) per
+    # assign/unassign so search can push and pop moves without a full check.
+    # Every change is trailed with the value it replaced, so undo() reverts
+    # assigns, overwrites and unassigns alike.
+    def __init__(self, grid=None, puzzle=None):
+        self.puzzle = p = puzzle or RULES
+        self.grid = [[0] * p.size for _ in range(p.size)]
+        self.row_counts = [[0, 0, 0] for _ in range(p.size)]
+        self.col_counts = [[0, 0, 0] for _ in range(p.size)]
+        self.violations = 0
+        self.trail = []
+        if grid is not None:
+            for r in range(p.size):
+                for c in range(p.size):
+                    if grid[r][c]:
+                        self._place(r, c, int(grid[r][c]))
+
+    def is_valid(self):
+        return self.violations == 0
+
+    def _place(self, r, c, v):
+        self.grid[r][c] = v
+        self.row_counts[r][v] += 1
+        self.col_counts[c][v] += 1
+        self.violations += _local_violations(self.grid, r, c, v, self.row_counts[r][v], self.col_counts[c][v], self.puzzle)
+
+    def _clear(self, r, c):
+        v = self.grid[r][c]
+        self.violations -= _local_violations(self.grid, r, c, v, self.row_counts[r][v], self.col_counts[c][v], self.puzzle)
+        self.row_counts[r][v] -= 1
+        self.col_counts[c][v] -= 1
+        self.grid[r][c] = 0
+
+    def assign(self, r, c, v):
+        prev = self.grid[r][c]
+        self.trail.append((r, c, prev))
+        if prev:
+            self._clear(r, c)
+        self._place(r, c, v)
+        return self.violations == 0
+
+    def unassign(self, r, c):
+        prev = self.grid[r][c]
+        if not prev:
+            return
+        self.trail.append((r, c, prev))
+        self._clear(r, c)
+
+    def undo(self):
+        r, c, prev = self.trail.pop()
+        if self.grid[r][c]:
+            self._clear(r, c)
+        if prev:
+            self._place(r, c, prev)
+        return r, c
+
+@profiled
+def batch_is_valid(grids, return_masks=False, puzzle=None):
+    # Validate a (B, N, N) stack at once. With return_masks, also return a
+    # (B, N, N) boolean array marking the same cells as error_cells().
+    p = puzzle or RULES
+    grids = np.asarray(grids)
+    batch, n = grids.shape[0], p.size
+    rows = sliding_window_view(grids, 3, axis=2)
+    row_triples = (rows[..., 0] != 0) & (rows[..., 0] == rows[..., 1]) & (rows[..., 1] == rows[..., 2])
+    cols = sliding_window_view(grids, 3, axis=1)
+    col_triples = (cols[..., 0] != 0) & (cols[..., 0] == cols[..., 1]) & (cols[..., 1] == cols[..., 2])
+    suns = grids == 1
+    moons = grids == 2
+    row_over = (suns.sum(axis=2) > p.limit) | (moons.sum(axis=2) > p.limit)
+    col_over = (suns.sum(axis=1) > p.limit) | (moons.sum(axis=1) > p.limit)
+    flat = grids.reshape(batch, -1)
+    a = flat[:, p.edge_first]
+    b = flat[:, p.edge_second]
+    bad_edges = (a != 0) & (b != 0) & np.where(p.edge_equal, a != b, a == b)
+    valid = ~(row_triples.any(axis=(1, 2)) | col_triples.any(axis=(1, 2))
+              | row_over.any(axis=1) | col_over.any(axis=1) | bad_edges.any(axis=1))
+    if not return_masks:
+        return valid
+    masks = np.zeros(grids.shape, dtype=bool)
+    for k in range(3):
+        masks[:, :, k:n - 2 + k] |= row_triples
+        masks[:, k:n - 2 + k, :] |= col_triples
+    masks |= row_over[:, :, None]
+    masks |= col_over[:, None, :]
+    masks |= ((bad_edges.astype(np.uint8) @ p.edge_incidence) > 0).reshape(grids.shape)
+    return valid, masks
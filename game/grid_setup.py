@@ -1,18 +1,15 @@
-import numpy as np
+from game.pack import load_puzzle
 
-GRID_SIZE = 6
-
-locked_cells = {
-    (0, 1): 1,
-    (2, 2): 2,
-    (4, 5): 1,
-    (5, 0): 2,
-    (3, 4): 1
-
-}
+# The puzzle the UI modes and the headless CLI load by default: the classic
+# 6x6 puzzle at index 0 of the bundled pack (tango.py --pack/--index pick another)
+puzzle = load_puzzle()
+locked_cells = puzzle.locked
 
 def create_initial_grid():
-    grid = np.zeros((GRID_SIZE, GRID_SIZE), dtype=int)
-    for (r, c), val in locked_cells.items():
-        grid[r][c] = val
-    return grid
+    return puzzle.initial_grid()
+
+def use_puzzle(new_puzzle):
+    # Swap the puzzle the modes load; must run before a UI module is imported.
+    global puzzle, locked_cells
+    puzzle = new_puzzle
+    locked_cells = puzzle.locked
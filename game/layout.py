@@ -0,0 +1,12 @@
+# Window geometry shared by the pygame modes, derived from the board size
+
+PADDING = 10
+TOP_BAR_HEIGHT = 100
+MIN_WINDOW_WIDTH = 470  # room for the timer and the three top-bar buttons
+
+def cell_size(size):
+    return max(32, min(75, 600 // size))
+
+def window_size(size):
+    grid_area = size * cell_size(size)
+    return max(grid_area + 2 * PADDING, MIN_WINDOW_WIDTH), grid_area + TOP_BAR_HEIGHT + 2 * PADDING
@@ -0,0 +1,171 @@
+# Compact binary puzzle packs (.tngo) and a memory-mapped reader.
+#
+# Layout (little-endian): a 16-byte header
+#     magic b"TNGO", version u8, size u8, flags u16, count u32, stride u32
+# followed by `count` fixed-width records of `stride` bytes:
+#     givens   2 bits per cell (0 empty, 1 sun, 2 moon), 4 cells per byte
+#     edges_h  2 bits per cell for the edge to its right (0 none, 1 '=', 2 'x')
+#     edges_v  2 bits per cell for the edge below it, same codes
+#     solution 1 bit per cell (1 = sun), only with FLAG_SOLUTIONS
+# Every record of a pack has the same width, so puzzle k lives at
+# 16 + k * stride and the offset index costs nothing to store or load.
+
+import mmap
+import os
+import struct
+import numpy as np
+from game.puzzle import Puzzle
+
+MAGIC = b"TNGO"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHII")
+FLAG_SOLUTIONS = 1
+
+DEFAULT_PACK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "puzzles", "classic.tngo")
+
+EDGE_CODES = {'=': 1, 'x': 2}
+EDGE_SYMBOLS = " =x"
+
+def record_dtype(size, with_solutions):
+    cells = size * size
+    fields = [("givens", np.uint8, (cells // 4,)),
+              ("edges_h", np.uint8, (cells // 4,)),
+              ("edges_v", np.uint8, (cells // 4,))]
+    if with_solutions:
+        fields.append(("solution", np.uint8, ((cells + 7) // 8,)))
+    return np.dtype(fields)
+
+def pack2(cells):
+    # (..., 4k) values 0-3 -> (..., k) bytes, cell i in bits 2(i % 4).
+    cells = np.asarray(cells, dtype=np.uint8)
+    return cells[..., 0::4] | cells[..., 1::4] << 2 | cells[..., 2::4] << 4 | cells[..., 3::4] << 6
+
+def unpack2(packed):
+    # Inverse of pack2.
+    packed = np.asarray(packed, dtype=np.uint8)
+    cells = packed[..., None] >> np.array([0, 2, 4, 6], dtype=np.uint8) & 3
+    return cells.reshape(packed.shape[:-1] + (packed.shape[-1] * 4,))
+
+def encode(puzzle, solution=None, with_solutions=False):
+    n = puzzle.size
+    record = np.zeros((), dtype=record_dtype(n, with_solutions))
+    record["givens"] = pack2(puzzle.initial_grid().ravel())
+    for direction, field in (('H', "edges_h"), ('V', "edges_v")):
+        codes = np.zeros(n * n, dtype=np.uint8)
+        for (r, c), (symbol, d) in puzzle.constraints.items():
+            if d == direction:
+                codes[r * n + c] = EDGE_CODES[symbol]
+        record[field] = pack2(codes)
+    if with_solutions and solution is not None:
+        record["solution"] = np.packbits(np.asarray(solution).ravel() == 1, bitorder="little")
+    return record
+
+def decode(record, size):
+    # (Puzzle, solution or None) from one record (a numpy void/view).
+    givens = unpack2(record["givens"])
+    locked = {divmod(int(i), size): int(givens[i]) for i in np.flatnonzero(givens)}
+    constraints = {}
+    for direction, field in (('H', "edges_h"), ('V', "edges_v")):
+        codes = unpack2(record[field])
+        for i in np.flatnonzero(codes):
+            constraints[divmod(int(i), size)] = (EDGE_SYMBOLS[codes[i]], direction)
+    solution = None
+    if "solution" in record.dtype.names:
+        bits = np.unpackbits(record["solution"], bitorder="little")[:size * size]
+        if bits.any():
+            solution = np.where(bits.reshape(size, size), 1, 2)
+    return Puzzle(locked, constraints, size), solution
+
+class PackWriter:
+    # Streams records to disk; the count in the header is filled in on close().
+    def __init__(self, path, size, with_solutions=True):
+        self.size = size
+        self.with_solutions = with_solutions
+        self.count = 0
+        self.dtype = record_dtype(size, with_solutions)
+        self.file = open(path, "wb")
+        self._header()
+
+    def _header(self):
+        flags = FLAG_SOLUTIONS if self.with_solutions else 0
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.size, flags, self.count, self.dtype.itemsize))
+
+    def add(self, puzzle, solution=None):
+        if puzzle.size != self.size:
+            raise ValueError(f"pack holds {self.size}x{self.size} puzzles, got {puzzle.size}x{puzzle.size}")
+        self.file.write(encode(puzzle, solution, self.with_solutions).tobytes())
+        self.count += 1
+
+    def close(self):
+        self.file.seek(0)
+        self._header()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_pack(path, puzzles, solutions=None):
+    # puzzles: a non-empty sequence of same-size Puzzles.
+    puzzles = list(puzzles)
+    with PackWriter(path, puzzles[0].size, solutions is not None) as writer:
+        for k, puzzle in enumerate(puzzles):
+            writer.add(puzzle, solutions[k] if solutions is not None else None)
+
+def is_pack(path):
+    # Sniffs the magic bytes, so a pack is recognised whatever its name.
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+class Corpus:
+    # Read-only view of a pack: nothing is parsed up front, puzzle k is
+    # decoded on demand, and `records` is a structured numpy array mapped
+    # straight onto the file.
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size, flags, count, stride = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} Tango pack")
+        self.size = size
+        self.has_solutions = bool(flags & FLAG_SOLUTIONS)
+        dtype = record_dtype(size, self.has_solutions)
+        if stride != dtype.itemsize or len(self._map) < HEADER.size + count * stride:
+            raise ValueError(f"{path} is truncated or has an unexpected record size")
+        self.records = np.frombuffer(self._map, dtype=dtype, count=count, offset=HEADER.size)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, k):
+        return decode(self.records[k], self.size)[0]
+
+    def solution(self, k):
+        return decode(self.records[k], self.size)[1]
+
+    def givens(self, start=0, stop=None):
+        # (k, N, N) uint8 start grids for a slice of the pack, in one pass.
+        cells = unpack2(self.records["givens"][start:stop])
+        return cells.reshape(-1, self.size, self.size)
+
+    def views(self, batch=65536):
+        # Zero-copy slices of the mapped records, `batch` at a time.
+        for start in range(0, len(self.records), batch):
+            yield self.records[start:start + batch]
+
+    def close(self):
+        self.records = None
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def load_puzzle(path=DEFAULT_PACK, index=0):
+    with Corpus(path) as corpus:
+        return corpus[index]
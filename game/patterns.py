@@ -0,0 +1,93 @@
+# Valid complete lines and random full boards, per board size
+
+import random
+from functools import lru_cache
+from game.puzzle import Puzzle
+
+@lru_cache(maxsize=None)
+def line_patterns(size):
+    # Sun masks of every complete line with size/2 suns, size/2 moons and no
+    # three equal symbols in a row (bit j = cell j); moons are the complement.
+    # Built cell by cell so only valid prefixes are ever extended.
+    half = size // 2
+    patterns = []
+
+    def extend(mask, j, suns, run_bit, run):
+        if j == size:
+            patterns.append(mask)
+            return
+        for bit in (0, 1):
+            s = suns + bit
+            if s > half or j + 1 - s > half:
+                continue
+            if bit == run_bit and run == 2:
+                continue
+            extend(mask | bit << j, j + 1, s, bit, run + 1 if bit == run_bit else 1)
+
+    extend(0, 0, 0, None, 0)
+    return tuple(sorted(patterns))
+
+def random_solution(size, rng=None):
+    # Random valid full board, built row by row from the line patterns and
+    # backtracking when a column can no longer be completed.
+    rng = rng or random.Random()
+    full = (1 << size) - 1
+    limit = size // 2
+    patterns = list(line_patterns(size))
+    rows = []
+    suns = [0] * size
+
+    def fits(p):
+        r = len(rows)
+        a = rows[-2] if r >= 2 else None
+        b = rows[-1] if r >= 1 else None
+        if a is not None and (a & b & p or (full ^ a) & (full ^ b) & (full ^ p)):
+            return False
+        for j in range(size):
+            bit = p >> j & 1
+            s = suns[j] + bit
+            need_s, need_m = limit - s, limit - (r + 1 - s)
+            if need_s < 0 or need_m < 0:
+                return False
+            # length of the run the new cell ends, to bound what still fits below it
+            run = 1
+            if b is not None and (b >> j & 1) == bit:
+                run = 2
+            run_s, run_m = (run, 0) if bit else (0, run)
+            if need_s > 2 * need_m + 2 - run_s or need_m > 2 * need_s + 2 - run_m:
+                return False
+        return True
+
+    def place(r):
+        if r == size:
+            return True
+        order = patterns[:]
+        rng.shuffle(order)
+        for p in order:
+            if fits(p):
+                rows.append(p)
+                for j in range(size):
+                    suns[j] += p >> j & 1
+                if place(r + 1):
+                    return True
+                rows.pop()
+                for j in range(size):
+                    suns[j] -= p >> j & 1
+        return False
+
+    place(0)
+    return [[1 if p >> j & 1 else 2 for j in range(size)] for p in rows]
+
+def random_puzzle(size, rng=None, given_ratio=0.35, edge_ratio=0.1):
+    # A solvable puzzle cut from a random solution: a share of the cells
+    # become givens and a share of neighbouring pairs get '=' / 'x' edges.
+    rng = rng or random.Random()
+    solution = random_solution(size, rng)
+    locked = {(r, c): solution[r][c] for r in range(size) for c in range(size) if rng.random() < given_ratio}
+    edges = {}
+    for r in range(size):
+        for c in range(size):
+            for direction, (r2, c2) in (('H', (r, c + 1)), ('V', (r + 1, c))):
+                if r2 < size and c2 < size and rng.random() < edge_ratio / 2:
+                    edges[(r, c)] = ('=' if solution[r][c] == solution[r2][c2] else 'x', direction)
+    return Puzzle(locked, edges, size), solution
@@ -0,0 +1,155 @@
+# Runs a solver in a worker thread and plays its steps back in the UI thread.
+#
+# The worker runs the solver at full speed on its own copy of the board and
+# emits step snapshots into a bounded queue; when playback falls behind it
+# blocks on the full queue instead of buffering without limit. The UI loop
+# calls poll(), which releases steps at `speed` per second and runs
+# on_step/on_done in the UI thread, so only that thread ever touches pygame.
+#
+# Solvers that have no steps to emit poll stopping() instead, so Esc, Undo
+# and Clear stop them too.
+#
+# Keys: space pauses/resumes, +/- (or up/down) change the speed, End/Enter
+# skips to the end and Esc cancels.
+
+import queue
+import threading
+import time
+import pygame
+
+SPEEDS = (1, 2, 3, 5, 7, 10, 20, 50, 100, 250, 1000)  # steps per second
+POLL_MS = 10  # wake-up interval while waiting on the worker
+
+_DONE = object()
+
+class Cancelled(Exception):
+    pass
+
+class Playback:
+    def __init__(self, speed=10, maxsize=256):
+        self.speed = speed
+        self.maxsize = maxsize
+        self.active = False
+        self.paused = self.skipping = self.cancelled = False
+
+    def start(self, job, on_step, on_done):
+        # job(emit) runs in the worker and returns the result handed to
+        # on_done (None if cancelled); each emit(step) reaches on_step(step).
+        self.queue = queue.Queue(self.maxsize)
+        self.on_step, self.on_done = on_step, on_done
+        self.active = True
+        self.paused = self.skipping = self.cancelled = False
+        self.result = self.error = None
+        self.due = time.perf_counter()
+        self.thread = threading.Thread(target=self._work, args=(job,), daemon=True)
+        self.thread.start()
+
+    def _work(self, job):
+        try:
+            self.result = job(self.emit)
+        except Cancelled:
+            pass
+        except Exception as exc:
+            self.error = exc
+        self.queue.put(_DONE)
+
+    def stopping(self):
+        # Worker side: True once the user cancelled, for solvers that emit no
+        # steps to poll from their own search loop (should_stop).
+        return self.cancelled
+
+    def emit(self, step):
+        # Worker side: blocks while the queue is full, drops steps once the
+        # user skips to the end and unwinds the solver on cancel.
+        while True:
+            if self.cancelled:
+                raise Cancelled
+            if self.skipping:
+                return
+            try:
+                self.queue.put(step, timeout=POLL_MS / 1000)
+                return
+            except queue.Full:
+                pass
+
+    def poll(self):
+        # UI side: apply the steps that are due (only the latest one is shown)
+        # and finish once the worker is done.
+        if not self.active:
+            return
+        now = time.perf_counter()
+        draining = self.skipping or self.cancelled
+        latest = None
+        finished = False
+        while draining or not self.paused and now >= self.due:
+            try:
+                step = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if step is _DONE:
+                finished = True
+                break
+            if not self.cancelled:
+                latest = step
+            if not draining:
+                self.due += 1 / self.speed
+        if self.due < now:
+            self.due = now  # no burst of catch-up steps after a stall
+        if latest is not None:
+            self.on_step(latest)
+        if finished:
+            self.active = False
+            if self.error is not None:
+                raise self.error
+            self.on_done(None if self.cancelled else self.result)
+
+    def timeout(self, idle=None):
+        # Milliseconds the UI may sleep before the next poll; `idle` is the
+        # caller's own wake-up interval (None to wait for input).
+        if not self.active or self.paused and not (self.skipping or self.cancelled):
+            return idle
+        wait = POLL_MS if self.skipping or self.cancelled else max(POLL_MS, int((self.due - time.perf_counter()) * 1000))
+        return wait if idle is None else min(wait, idle)
+
+    def pause(self):
+        self.paused = not self.paused
+        self.due = time.perf_counter()
+
+    def skip(self):
+        self.skipping = self.active
+
+    def cancel(self):
+        self.cancelled = self.active
+
+    def change_speed(self, direction):
+        k = min(range(len(SPEEDS)), key=lambda i: abs(SPEEDS[i] - self.speed))
+        self.speed = SPEEDS[max(0, min(len(SPEEDS) - 1, k + direction))]
+
+    def handle_key(self, key):
+        # Returns True when the key was a playback control.
+        if key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS, pygame.K_UP):
+            self.change_speed(1)
+        elif key in (pygame.K_MINUS, pygame.K_KP_MINUS, pygame.K_DOWN):
+            self.change_speed(-1)
+        elif not self.active:
+            return False
+        elif key == pygame.K_SPACE:
+            self.pause()
+        elif key in (pygame.K_END, pygame.K_RETURN):
+            self.skip()
+        elif key == pygame.K_ESCAPE:
+            self.cancel()
+        else:
+            return False
+        return True
+
+    def status(self):
+        if not self.active:
+            return f"{self.speed} steps/s"
+        if self.cancelled:
+            return "cancelling"
+        if self.skipping:
+            return "skipping to the end"
+        if self.paused:
+            return f"paused ({self.speed} steps/s)"
+        return f"playing at {self.speed} steps/s"
@@ -0,0 +1,63 @@
+import numpy as np
+
+GRID_SIZE = 6
+
+def on_board(cell, direction, size=GRID_SIZE):
+    r, c = cell
+    return not (direction == 'H' and c == size - 1 or direction == 'V' and r == size - 1)
+
+def edge_masks(constraints, size=GRID_SIZE):
+    # Bit c of eq_h[r] marks an '=' between (r, c) and (r, c+1),
+    # bit r of eq_v[c] marks an '=' between (r, c) and (r+1, c).
+    eq_h, x_h = [0] * size, [0] * size
+    eq_v, x_v = [0] * size, [0] * size
+    for (r, c), (symbol, direction) in constraints.items():
+        if direction == 'H':
+            (eq_h if symbol == '=' else x_h)[r] |= 1 << c
+        else:
+            (eq_v if symbol == '=' else x_v)[c] |= 1 << r
+    return eq_h, x_h, eq_v, x_v
+
+def incident_edges(constraints):
+    # cell -> [(neighbour, symbol)] for every '=' / 'x' edge touching the cell
+    edges = {}
+    for (r, c), (symbol, direction) in constraints.items():
+        other = (r, c + 1) if direction == 'H' else (r + 1, c)
+        edges.setdefault((r, c), []).append((other, symbol))
+        edges.setdefault(other, []).append(((r, c), symbol))
+    return edges
+
+def edge_arrays(constraints, size=GRID_SIZE):
+    # Flat cell indices of both ends of every edge, an '=' flag per edge and
+    # an (edges, cells) incidence matrix for scattering edge errors to cells.
+    first, second, equal = [], [], []
+    for (r, c), (symbol, direction) in constraints.items():
+        other = (r, c + 1) if direction == 'H' else (r + 1, c)
+        first.append(r * size + c)
+        second.append(other[0] * size + other[1])
+        equal.append(symbol == '=')
+    incidence = np.zeros((len(first), size * size), dtype=np.uint8)
+    incidence[np.arange(len(first)), first] = 1
+    incidence[np.arange(len(first)), second] = 1
+    return np.array(first, dtype=np.intp), np.array(second, dtype=np.intp), np.array(equal, dtype=bool), incidence
+
+class Puzzle:
+    # Board size, givens and '=' / 'x' edges of one puzzle, with the rule
+    # tables the checkers need compiled once up front.
+    def __init__(self, locked, constraints, size=GRID_SIZE):
+        if size < 4 or size % 2:
+            raise ValueError(f"board size must be even and at least 4, got {size}")
+        self.size = size
+        self.limit = size // 2  # most suns (or moons) allowed in one line
+        self.weights = 1 << np.arange(size, dtype=np.int64)
+        self.locked = dict(locked)
+        self.constraints = {k: v for k, v in constraints.items() if on_board(k, v[1], size)}
+        self.eq_h, self.x_h, self.eq_v, self.x_v = edge_masks(self.constraints, size)
+        self.incident = incident_edges(self.constraints)
+        self.edge_first, self.edge_second, self.edge_equal, self.edge_incidence = edge_arrays(self.constraints, size)
+
+    def initial_grid(self):
+        grid = np.zeros((self.size, self.size), dtype=int)
+        for (r, c), val in self.locked.items():
+            grid[r][c] = val
+        return grid
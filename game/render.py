@@ -0,0 +1,203 @@
+# Shared pygame renderer for the manual and solver modes.
+#
+# Nothing is redrawn unless it changed: a frame repaints only the cells whose
+# value or border colour differs from what is on screen, and only text whose
+# content changed. Errors are recomputed only when the grid changes, and only
+# the cells entering or leaving the error set are repainted. The display is
+# updated with just those rects. Sprites, constraint glyphs, button pills and
+# text surfaces are all rendered once and cached (text in a small LRU).
+# wait() sleeps in pygame.event.wait until input or the next timer tick, at
+# most FPS times a second, so an idle window uses next to no CPU.
+
+import os
+from collections import OrderedDict
+import numpy as np
+import pygame
+from game.constraints import error_cells
+from game.layout import PADDING, TOP_BAR_HEIGHT, cell_size, window_size
+
+ASSET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "images")
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+GREEN = (0, 200, 0)
+BLUE = (0, 0, 255)
+ORANGE = (255, 165, 0)
+GRAY_TRANSPARENT = (150, 150, 150, 180)
+BORDER_COLOR = (100, 100, 100)
+
+FPS = 60
+TICK_MS = 100  # wake-up interval while a timer is running
+TEXT_CACHE_SIZE = 64  # rendered strings kept; labels and recent timer values
+
+class Renderer:
+    def __init__(self, puzzle, buttons, caption="Tango Game", fps=FPS):
+        # buttons: labels laid out right to left from the window's top-right corner
+        pygame.init()
+        self.puzzle = puzzle
+        self.size = puzzle.size
+        self.cell = cell_size(puzzle.size)
+        self.width, self.height = window_size(puzzle.size)
+        self.screen = pygame.display.set_mode((self.width, self.height))
+        self.caption = caption
+        pygame.display.set_caption(caption)
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
+        self.fps = fps
+        self.clock = pygame.time.Clock()
+        self.font = pygame.font.SysFont("arial", 25)
+        self.button_font = pygame.font.SysFont("arial", 17)
+        self._text_cache = OrderedDict()
+        side = self.cell - 20
+        self.sprites = {value: pygame.transform.scale(pygame.image.load(os.path.join(ASSET_PATH, name)).convert_alpha(),
+                                                      (side, side))
+                        for value, name in ((1, "sun.png"), (2, "moon.png"))}
+        self.buttons = [self._pill(label, (self.width - 50 - 80 * k, 25))
+                        for k, label in enumerate(reversed(buttons))]
+        self.glyphs = self._edge_glyphs()
+        self.invalidate()
+
+    def text(self, text, color, font=None):
+        font = font or self.font
+        key = (text, color, id(font))
+        surface = self._text_cache.get(key)
+        if surface is None:
+            surface = self._text_cache[key] = font.render(text, True, color)
+            # bounded: the timer alone renders a new string every second
+            if len(self._text_cache) > TEXT_CACHE_SIZE:
+                self._text_cache.popitem(last=False)
+        else:
+            self._text_cache.move_to_end(key)
+        return surface
+
+    def _pill(self, label, center, padding=20):
+        text = self.text(label, BLACK, self.button_font)
+        rect = pygame.Rect(0, 0, text.get_width() + 2 * padding, text.get_height() + padding)
+        rect.center = center
+        surface = pygame.Surface(rect.size, pygame.SRCALPHA)
+        pygame.draw.rect(surface, GRAY_TRANSPARENT, surface.get_rect(), border_radius=rect.height // 2)
+        pygame.draw.rect(surface, BORDER_COLOR, surface.get_rect(), width=2, border_radius=rect.height // 2)
+        surface.blit(text, text.get_rect(center=surface.get_rect().center))
+        return label, surface, rect
+
+    def _edge_glyphs(self):
+        # (r, c) -> [(surface, topleft)] for every constraint symbol drawn over
+        # that cell, so a repainted cell can put its half of the symbol back.
+        glyphs = {}
+        n = self.size
+        for (r, c), (symbol, direction) in self.puzzle.constraints.items():
+            if direction == 'H' and c < n - 1:
+                center, other = (PADDING + (c + 1) * self.cell, TOP_BAR_HEIGHT + PADDING + (r + 0.5) * self.cell), (r, c + 1)
+            elif direction == 'V' and r < n - 1:
+                center, other = (PADDING + (c + 0.5) * self.cell, TOP_BAR_HEIGHT + PADDING + (r + 1) * self.cell), (r + 1, c)
+            else:
+                continue
+            surface = self.text(symbol, RED)
+            topleft = surface.get_rect(center=center).topleft
+            for cell in ((r, c), other):
+                glyphs.setdefault(cell, []).append((surface, topleft))
+        return glyphs
+
+    def cell_rect(self, r, c):
+        return pygame.Rect(PADDING + c * self.cell, TOP_BAR_HEIGHT + PADDING + r * self.cell, self.cell, self.cell)
+
+    def cell_at(self, pos):
+        x, y = pos[0] - PADDING, pos[1] - TOP_BAR_HEIGHT - PADDING
+        if x < 0 or y < 0:
+            return None
+        r, c = y // self.cell, x // self.cell
+        return (r, c) if r < self.size and c < self.size else None
+
+    def button_at(self, pos):
+        for label, _, rect in self.buttons:
+            if rect.collidepoint(pos):
+                return label
+        return None
+
+    def invalidate(self):
+        # Repaint everything on the next draw (first frame, window exposed).
+        self.full = True
+
+    def _paint_cell(self, r, c, value, color):
+        rect = self.cell_rect(r, c)
+        screen = self.screen
+        screen.set_clip(rect)
+        screen.fill(WHITE, rect)
+        pygame.draw.rect(screen, color, rect, 1 if color == BLACK else 3)
+        if value:
+            screen.blit(self.sprites[value], (rect.x + 5, rect.y + 5))
+        for surface, topleft in self.glyphs.get((r, c), ()):
+            screen.blit(surface, topleft)
+        screen.set_clip(None)
+        self.dirty.append(rect)
+
+    def draw(self, grid, texts=(), highlight=(), highlight_color=ORANGE):
+        # texts: (text, color, topleft) items for the top bar; highlight: cells
+        # given a thick highlight_color border (over the red error border).
+        values = np.asarray(grid)
+        highlight = set(highlight)
+        self.dirty = []
+        n = self.size
+        if self.full:
+            self.full = False
+            self.screen.fill(WHITE)
+            for _, surface, rect in self.buttons:
+                self.screen.blit(surface, rect)
+            self.dirty.append(self.screen.get_rect())
+            self.errors = error_cells(values, self.puzzle)
+            self.shown_texts = {}
+            cells = [(r, c) for r in range(n) for c in range(n)]
+        else:
+            cells = set()
+            changed = values != self.values
+            if changed.any():
+                cells.update((int(r), int(c)) for r, c in zip(*np.nonzero(changed)))
+                errors = error_cells(values, self.puzzle)
+                cells |= errors ^ self.errors
+                self.errors = errors
+            cells |= highlight ^ self.highlight
+            if highlight_color != self.highlight_color:
+                cells |= highlight
+        self.values = values.copy()
+        self.highlight, self.highlight_color = highlight, highlight_color
+        for r, c in cells:
+            color = highlight_color if (r, c) in highlight else RED if (r, c) in self.errors else BLACK
+            self._paint_cell(r, c, int(values[r][c]), color)
+        self._draw_texts(texts)
+        if self.dirty:
+            pygame.display.update(self.dirty)
+
+    def _draw_texts(self, texts):
+        wanted = {pos: (text, color) for text, color, pos in texts}
+        for pos, (content, rect) in list(self.shown_texts.items()):
+            if wanted.get(pos) != content:
+                self.screen.fill(WHITE, rect)
+                self.dirty.append(rect)
+                del self.shown_texts[pos]
+        for pos, (text, color) in wanted.items():
+            if pos not in self.shown_texts:
+                surface = self.text(text, color)
+                rect = self.screen.blit(surface, pos)
+                self.shown_texts[pos] = ((text, color), rect)
+                self.dirty.append(rect)
+
+    def wait(self, timeout=None):
+        # Sleep until input arrives (or `timeout` ms pass) and return every
+        # pending event; frames are capped at self.fps.
+        self.clock.tick(self.fps)
+        first = pygame.event.wait(timeout) if timeout else pygame.event.wait()
+        events = pygame.event.get()
+        if first.type != pygame.NOEVENT:
+            events.insert(0, first)
+        for event in events:
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.invalidate()
+        return events
+
+    def set_caption(self, caption):
+        if caption != self.caption:
+            self.caption = caption
+            pygame.display.set_caption(caption)
+
+    def close(self):
+        pygame.quit()
@@ -0,0 +1,122 @@
+# Line-pattern propagation visualization: cells forced by each round light up
+
+import numpy as np
+import pygame
+import time
+from game.constraints import check_win
+from game.grid_setup import create_initial_grid, puzzle
+from game.playback import Playback
+from game.render import BLACK, GREEN, ORANGE, TICK_MS, Renderer
+from engine.api import solver_version
+from engine.cache import SolutionCache, cache_key
+from engine.lines import solve as lines_solve
+
+locked_cells = puzzle.locked
+
+GRID_SIZE = puzzle.size
+
+def setup():
+    global renderer
+    renderer = Renderer(puzzle, ("Solve", "Undo", "Clear"))
+
+grid = create_initial_grid()
+
+highlighted_cells = set()
+history = []
+start_time = None
+timer_stopped = False
+player = Playback(speed=7)
+cache = SolutionCache()  # tango.py --cache swaps in one backed by a file
+
+
+def draw_grid():
+    elapsed = time.time() - start_time if start_time and not timer_stopped else (stop_time - start_time if start_time else 0)
+    mins, secs = divmod(int(elapsed), 60)
+    texts = [(f"Time: {mins:02}:{secs:02}", BLACK, (10, 5))]
+    if check_win(grid, puzzle):
+        texts.append(("You Win!", GREEN, (200, 60)))
+    renderer.draw(grid, texts, highlighted_cells, ORANGE)
+
+def show_step(step):
+    snapshot, changed = step
+    grid[:, :] = snapshot
+    highlighted_cells.clear()
+    highlighted_cells.update(changed)
+
+def solve():
+    # Propagation runs on a copy in a worker thread; show_step replays each
+    # round with the cells it forced lit up. A board solved before is
+    # answered from the cache without a search.
+    work = grid.copy()
+    view = grid.copy()
+    key = cache_key(work, puzzle, "lines")
+    hit = key and cache.get(key, solver_version("lines"))
+
+    def job(emit):
+        if hit:
+            return hit
+        def step(state):
+            before = view.copy()
+            state.to_grid(view)
+            emit((view.copy(), set(zip(*np.nonzero(view != before)))))
+        return lines_solve(work, puzzle, on_step=step)
+
+    history.append(np.copy(grid))
+    player.start(job, show_step, lambda result: finish(result, None if hit else key))
+
+def finish(result, key=None):
+    # key: where to cache a fresh result (finish runs in the UI thread, which
+    # owns the cache)
+    global stop_time, timer_stopped
+    highlighted_cells.clear()
+    if result is not None:
+        solution, stats = result
+        if key:
+            cache.put(key, solver_version("lines"), solution, stats)
+        if solution is None:
+            print("No pattern assignment satisfies every line")
+        else:
+            grid[:, :] = solution
+    stop_time = time.time()
+    timer_stopped = True
+
+
+def main():
+    global start_time, timer_stopped
+    setup()
+    running = True
+    while running:
+        player.poll()
+        renderer.set_caption(f"Tango Game - line patterns - {player.status()}")
+        draw_grid()
+        for event in renderer.wait(player.timeout(TICK_MS if start_time and not timer_stopped else None)):
+            if event.type == pygame.QUIT:
+                player.cancel()
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                player.handle_key(event.key)
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                button = renderer.button_at(event.pos)
+                if button in ("Undo", "Clear"):
+                    player.cancel()
+                if button == "Undo" and history:
+                    grid[:, :] = history.pop()
+                    start_time = None
+                    timer_stopped = False
+                elif button == "Clear":
+                    history.append(np.copy(grid))
+                    for i in range(GRID_SIZE):
+                        for j in range(GRID_SIZE):
+                            if (i, j) not in locked_cells:
+                                grid[i][j] = 0
+                    start_time = None
+                    timer_stopped = False
+                elif button == "Solve" and not player.active:
+                    if not start_time:
+                        start_time = time.time()
+                    timer_stopped = False
+                    solve()
+    renderer.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# CDCL SAT solving: the board is encoded as CNF and solved in one go
+
+import numpy as np
+import pygame
+import time
+from game.constraints import check_win
+from game.grid_setup import create_initial_grid, puzzle
+from game.playback import Playback
+from game.render import BLACK, GREEN, TICK_MS, Renderer
+from engine.api import solver_version
+from engine.cache import SolutionCache, cache_key
+from engine.sat import solve as sat_solve
+
+locked_cells = puzzle.locked
+
+GRID_SIZE = puzzle.size
+
+def setup():
+    global renderer
+    renderer = Renderer(puzzle, ("Solve", "Undo", "Clear"))
+
+grid = create_initial_grid()
+
+history = []
+start_time = None
+timer_stopped = False
+player = Playback()
+cache = SolutionCache()  # tango.py --cache swaps in one backed by a file
+
+
+def draw_grid():
+    elapsed = time.time() - start_time if start_time and not timer_stopped else (stop_time - start_time if start_time else 0)
+    mins, secs = divmod(int(elapsed), 60)
+    texts = [(f"Time: {mins:02}:{secs:02}", BLACK, (10, 5))]
+    if check_win(grid, puzzle):
+        texts.append(("You Win!", GREEN, (200, 60)))
+    renderer.draw(grid, texts)
+
+def solve():
+    # The solver has no steps to show; the worker thread keeps the window
+    # responsive while it runs, and it polls the player to stop on cancel. A
+    # board solved before is answered from the cache without a search.
+    work = grid.copy()
+    key = cache_key(work, puzzle, "sat")
+    hit = key and cache.get(key, solver_version("sat"))
+    history.append(np.copy(grid))
+    player.start(lambda emit: hit or sat_solve(work, puzzle, should_stop=player.stopping), None,
+                 lambda result: finish(result, None if hit else key))
+
+def finish(result, key=None):
+    # key: where to cache a fresh result (finish runs in the UI thread, which
+    # owns the cache)
+    global stop_time, timer_stopped
+    if result is not None:
+        solution, stats = result
+        if key:
+            cache.put(key, solver_version("sat"), solution, stats)
+        if solution is None:
+            print("UNSAT: the puzzle has no solution from this position")
+        else:
+            grid[:, :] = solution
+        print(", ".join(f"{key}: {value}" for key, value in stats.items()))
+    stop_time = time.time()
+    timer_stopped = True
+
+
+def main():
+    global start_time, timer_stopped
+    setup()
+    running = True
+    while running:
+        player.poll()
+        renderer.set_caption(f"Tango Game - CDCL SAT{' - solving' if player.active else ''}")
+        draw_grid()
+        for event in renderer.wait(player.timeout(TICK_MS if start_time and not timer_stopped else None)):
+            if event.type == pygame.QUIT:
+                player.cancel()
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                player.cancel()
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                button = renderer.button_at(event.pos)
+                if button in ("Undo", "Clear"):
+                    player.cancel()
+                if button == "Undo" and history:
+                    grid[:, :] = history.pop()
+                    start_time = None
+                    timer_stopped = False
+                elif button == "Clear":
+                    history.append(np.copy(grid))
+                    for i in range(GRID_SIZE):
+                        for j in range(GRID_SIZE):
+                            if (i, j) not in locked_cells:
+                                grid[i][j] = 0
+                    start_time = None
+                    timer_stopped = False
+                elif button == "Solve" and not player.active:
+                    if not start_time:
+                        start_time = time.time()
+                    timer_stopped = False
+                    solve()
+    renderer.close()
+
+if __name__ == "__main__":
+    main()
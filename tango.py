@@ -1,22 +1,136 @@
 import argparse
-from manual.play import main as manual_main
-from solvers.astar import main as astar_main
-from solvers.ac3 import main as ac3_main
-from solvers.qlearn import main as qlearn_main
+import importlib
+import sys
+
+# Modules are imported only once their mode is picked, so one mode never
+# pays for (or opens windows from) another.
+MODES = {
+    "manual": "manual.play",
+    "astar": "solvers.astar",
+    "ac3": "solvers.ac3",
+    "qlearn": "solvers.qlearn",
+    "lines": "solvers.lines",
+    "sat": "solvers.sat",
+}
+
+def pick_puzzle(size, seed, pack=None, index=None):
+    # Puzzle `index` of a pack when either is given; otherwise the built-in
+    # 6x6 puzzle, or for other sizes (or a seed) a freshly generated puzzle
+    # with a unique solution.
+    from game import grid_setup
+    if pack or index is not None:
+        from game.pack import DEFAULT_PACK, load_puzzle
+        grid_setup.use_puzzle(load_puzzle(pack or DEFAULT_PACK, index or 0))
+        return
+    if size == 6 and seed is None:
+        return
+    import random
+    from engine.generate import generate_puzzle
+    grid_setup.use_puzzle(generate_puzzle(size, random.Random(seed))[0])
+
+def run_headless(mode, profile=False, **options):
+    from engine.api import solve
+    from engine.instrument import format_report
+    from game.grid_setup import puzzle, create_initial_grid
+    solution, stats = solve(create_initial_grid(), puzzle, mode, profile=profile, **options)
+    report = stats.pop("profile", None)
+    if options.get("cache") is not None:
+        stats.update(options["cache"].report())
+    if solution is None:
+        print("No solution found")
+    else:
+        for row in solution:
+            print(" ".join(".SM"[v] for v in row))
+    for key, value in stats.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+    if report:
+        print()
+        print(format_report(report))
+
+def export_dimacs(path):
+    from engine.sat import encode, write_dimacs
+    from game.grid_setup import puzzle, create_initial_grid
+    num_vars, clauses = encode(create_initial_grid(), puzzle)
+    with open(path, "w") as out:
+        out.write(f"c Tango {puzzle.size}x{puzzle.size}: variable r*N+c+1 is true for a sun\n")
+        write_dimacs(out, num_vars, clauses)
+    print(f"Wrote {num_vars} variables and {len(clauses)} clauses to {path}")
+
 def main():
-    parser = argparse.ArgumentParser(description="Tango Puzzle Game")
-    parser.add_argument("-m", "--mode", choices=["manual", "astar", "ac3", "qlearn"], required=True,
-                        help="Choose mode: manual (human play), astar (A* solving), ac3 (AC-3 with backtracking), qlearn (Q-Learning)")
+    if sys.argv[1:2] == ["solve-batch"]:
+        from engine.batch import main as solve_batch
+        sys.exit(solve_batch(sys.argv[2:]))
+    parser = argparse.ArgumentParser(description="Tango Puzzle Game",
+                                     epilog="Use 'tango.py solve-batch --help' to solve a file of puzzles.")
+    parser.add_argument("-m", "--mode", choices=list(MODES), required=True,
+                        help="Choose mode: manual (human play), astar (A* solving), ac3 (AC-3 with backtracking), qlearn (Q-Learning), lines (line-pattern propagation), sat (CDCL SAT)")
+    parser.add_argument("--headless", action="store_true",
+                        help="Solve without opening a window and print the solution and stats (solver modes only)")
+    parser.add_argument("--dimacs", metavar="PATH",
+                        help="With -m sat: write the puzzle's CNF encoding in DIMACS format and exit")
+    parser.add_argument("--size", type=int, default=6,
+                        help="Board size N for an N x N puzzle (even, default 6)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed for the generated puzzle used when --size is not 6")
+    parser.add_argument("--pack", metavar="PATH",
+                        help="Load the puzzle from a .tngo pack (default: the bundled assets/puzzles/classic.tngo)")
+    parser.add_argument("--index", type=int, default=None,
+                        help="Which puzzle of the pack to load (default 0)")
+    parser.add_argument("--stats", action="store_true",
+                        help="Report call counts and time per phase of the solve (or of the whole session in a window)")
+    parser.add_argument("--qtable", metavar="PATH",
+                        help="With -m qlearn: start from a Q-table saved by 'python -m engine.qlearn'")
+    parser.add_argument("--cache", metavar="PATH",
+                        help="Keep solutions in this SQLite file and answer repeated solves from it (solver windows keep them in memory by default)")
     args = parser.parse_args()
+    if args.size < 4 or args.size % 2:
+        parser.error("--size must be an even number of at least 4")
+    try:
+        pick_puzzle(args.size, args.seed, args.pack, args.index)
+    except (OSError, ValueError, IndexError) as exc:
+        parser.error(f"could not load the puzzle: {exc}")
 
-    if args.mode == "manual":
-        manual_main()
-    elif args.mode == "astar":
-        astar_main()
-    elif args.mode == "ac3":
-        ac3_main()
-    elif args.mode == "qlearn":
-        qlearn_main()
+    if args.dimacs:
+        if args.mode != "sat":
+            parser.error("--dimacs is only available with -m sat")
+        export_dimacs(args.dimacs)
+        return
+    options = {}
+    if args.qtable:
+        if args.mode != "qlearn":
+            parser.error("--qtable is only available with -m qlearn")
+        from engine.qlearn import QTable
+        from game.grid_setup import puzzle
+        try:
+            options["qtable"] = QTable.load(args.qtable, puzzle)
+        except (OSError, ValueError) as exc:
+            parser.error(f"could not load the Q-table: {exc}")
+        if not args.headless:
+            importlib.import_module(MODES["qlearn"]).agent.table = options["qtable"]
+    if args.cache:
+        if args.mode == "manual":
+            parser.error("--cache is only available with a solver mode")
+        import sqlite3
+        from engine.cache import SolutionCache
+        try:
+            options["cache"] = SolutionCache(path=args.cache)
+        except sqlite3.Error as exc:
+            parser.error(f"could not open the cache: {exc}")
+        if not args.headless:
+            window = importlib.import_module(MODES[args.mode])
+            if hasattr(window, "cache"):  # the learning agent is never cached
+                window.cache = options.pop("cache")
+    if args.headless:
+        if args.mode == "manual":
+            parser.error("manual mode needs a window; pick a solver mode for --headless")
+        run_headless(args.mode, args.stats, **options)
+    elif args.stats:
+        from engine.instrument import format_report, recording
+        with recording() as recorder:
+            importlib.import_module(MODES[args.mode]).main()
+        print(format_report(recorder.report()))
+    else:
+        importlib.import_module(MODES[args.mode]).main()
 
 if __name__ == "__main__":
     main()